@@ -26,7 +26,7 @@ echo Starting server...
 echo.
 
 REM Run server
-python -m uvicorn main_ai:app --host 0.0.0.0 --port 8000 --reload
+python -m uvicorn main_ai:app --host 0.0.0.0 --port 8000 --reload --http httptools
 
 pause
 
@@ -33,5 +33,5 @@ Write-Host "Starting server..." -ForegroundColor Cyan
 Write-Host ""
 
 # Run server
-python -m uvicorn main_ai:app --host 0.0.0.0 --port 8000 --reload
+python -m uvicorn main_ai:app --host 0.0.0.0 --port 8000 --reload --http httptools
 
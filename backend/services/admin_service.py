@@ -5,7 +5,11 @@ Provides comprehensive admin management for the entire platform
 import os
 from typing import Optional, Dict, Any, List
 from datetime import datetime, timedelta
-from supabase import create_client, Client
+from supabase import Client
+
+from .supabase_client import get_supabase_client
+from .user_role_service import user_role_service
+from .restaurant_service import restaurant_service
 
 # Supabase configuration
 SUPABASE_URL = os.getenv('SUPABASE_URL') or os.getenv('NEXT_PUBLIC_SUPABASE_URL')
@@ -22,7 +26,7 @@ class AdminService:
         self.supabase_client: Optional[Client] = None
         if SUPABASE_URL and SUPABASE_KEY:
             try:
-                self.supabase_client = create_client(SUPABASE_URL, SUPABASE_KEY)
+                self.supabase_client = get_supabase_client(SUPABASE_URL, SUPABASE_KEY)
                 print("✅ Admin Service: Supabase client initialized")
             except Exception as e:
                 print(f"⚠️ Admin Service: Failed to initialize Supabase client: {str(e)}")
@@ -216,6 +220,7 @@ class AdminService:
             filtered_updates['updated_at'] = datetime.now().isoformat()
 
             result = self.supabase_client.table('user_profiles').update(filtered_updates).eq('user_id', target_user_id).execute()
+            user_role_service.invalidate_user_role(target_user_id)
 
             # Log action
             self._log_admin_action(admin_user_id, 'update_user', 'user', target_user_id, old_value, filtered_updates)
@@ -296,6 +301,7 @@ class AdminService:
 
             # Delete user profile (cascade will handle related data)
             result = self.supabase_client.table('user_profiles').delete().eq('user_id', target_user_id).execute()
+            user_role_service.invalidate_user_role(target_user_id)
 
             return {"success": True, "message": "User deleted"}
         except Exception as e:
@@ -382,6 +388,7 @@ class AdminService:
 
             updates['updated_at'] = datetime.now().isoformat()
             result = self.supabase_client.table('restaurants').update(updates).eq('id', restaurant_id).execute()
+            restaurant_service.invalidate_cache(slug_changed='slug' in updates)
 
             self._log_admin_action(admin_user_id, 'update_restaurant', 'restaurant', restaurant_id, old_value, updates)
 
@@ -889,6 +896,7 @@ class AdminService:
                 'updated_at': now.isoformat()
             }
             self.supabase_client.table('user_profiles').update(user_updates).eq('user_id', user_id).execute()
+            user_role_service.invalidate_user_role(user_id)
 
             # Log action
             self._log_admin_action(admin_user_id, 'approve_bank_transfer', 'payment', payment_log_id, None, {
@@ -996,6 +1004,7 @@ class AdminService:
                 updates['trial_end_date'] = new_end_date.isoformat()
 
             self.supabase_client.table('user_profiles').update(updates).eq('user_id', target_user_id).execute()
+            user_role_service.invalidate_user_role(target_user_id)
 
             # Log action
             self._log_admin_action(admin_user_id, 'extend_subscription', 'user', target_user_id,
@@ -1059,6 +1068,7 @@ class AdminService:
                 updates['last_payment_date'] = now.isoformat()
 
             self.supabase_client.table('user_profiles').update(updates).eq('user_id', target_user_id).execute()
+            user_role_service.invalidate_user_role(target_user_id)
 
             # Log action
             self._log_admin_action(admin_user_id, 'change_plan', 'user', target_user_id,
@@ -1103,6 +1113,7 @@ class AdminService:
                 updates['is_active'] = False
 
             self.supabase_client.table('user_profiles').update(updates).eq('user_id', target_user_id).execute()
+            user_role_service.invalidate_user_role(target_user_id)
 
             # Log action
             self._log_admin_action(admin_user_id, 'cancel_subscription', 'user', target_user_id,
@@ -4,27 +4,44 @@ COST OPTIMIZATION: Uses gemini-1.5-flash for text, imagen-3.0-generate-001 for i
 """
 
 import os
-import base64
 import io
+import asyncio
 import uuid
-import requests
-from typing import Optional, Dict, Any
+import json
+import logging
+import httpx
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, Dict, Any, List, Union, BinaryIO
 from datetime import datetime
 from PIL import Image, ImageDraw, ImageFont
 
+try:
+    # SIMD-accelerated drop-in replacement (same b64encode/b64decode API)
+    import pybase64 as base64
+except ImportError:
+    import base64
+
 # CORRECT IMPORT: Use google.generativeai (Classic SDK)
 import google.generativeai as genai
 
 # Supabase for image storage
 try:
-    from supabase import create_client, Client
+    from supabase import Client
+    from .supabase_client import get_supabase_client
     SUPABASE_AVAILABLE = True
 except ImportError:
     SUPABASE_AVAILABLE = False
     print("⚠️ Supabase library not available. Install with: pip install supabase")
 
+from .translation_cache import translation_cache
+from .ttl_cache import TTLCache
+from .storage_objects import IMMUTABLE_CACHE_SECONDS
+
+logger = logging.getLogger(__name__)
+
 from dotenv import load_dotenv
 import pathlib
+import traceback
 
 # Load environment variables
 env_path = pathlib.Path(__file__).parent.parent.parent / '.env'
@@ -37,6 +54,9 @@ else:
 # Text models: gemini-2.0-flash (stable), gemini-2.5-flash (latest)
 TEXT_MODEL_NAME = "gemini-2.0-flash"  # Stable, fast text model
 TRANSLATION_MODEL_NAME = "gemini-2.0-flash"  # Translation (stable)
+TRANSLATION_CONCURRENCY = 8  # Max parallel per-item translation calls (Gemini QPM limit)
+TRANSLATE_STREAM_CHUNK_SIZE = 20  # Texts per batch translation call (also the NDJSON stream step)
+TRANSLATION_MAX_OUTPUT_TOKENS = 8192  # Output token ceiling of the translation model
 
 # Image models: gemini-2.5-flash-image-preview (supports generation & editing)
 # Reference: https://developers.googleblog.com/en/introducing-gemini-2-5-flash-image/
@@ -50,6 +70,22 @@ if GEMINI_API_KEY:
 else:
     print("⚠️ WARNING: GEMINI_API_KEY or GOOGLE_API_KEY not found in environment")
 
+# Language name normalization (codes / native names -> English name used in prompts)
+LANG_NORMALIZE = {
+    "English": "English", "en": "English", "EN": "English",
+    "Japanese": "Japanese", "日本語": "Japanese", "ja": "Japanese", "JP": "Japanese",
+    "Thai": "Thai", "ไทย": "Thai", "th": "Thai",
+    "Chinese": "Chinese", "中文": "Chinese", "zh": "Chinese",
+    "Korean": "Korean", "한국어": "Korean", "ko": "Korean",
+    "Vietnamese": "Vietnamese", "Tiếng Việt": "Vietnamese", "vi": "Vietnamese",
+    "Hindi": "Hindi", "हिंदी": "Hindi", "hi": "Hindi",
+    "Spanish": "Spanish", "Español": "Spanish", "es": "Spanish",
+    "French": "French", "Français": "French", "fr": "French",
+    "German": "German", "Deutsch": "German", "de": "German",
+    "Indonesian": "Indonesian", "Bahasa Indonesia": "Indonesian", "id": "Indonesian",
+    "Malay": "Malay", "Bahasa Melayu": "Malay", "ms": "Malay",
+}
+
 # Supabase Configuration
 SUPABASE_URL = os.getenv('SUPABASE_URL') or os.getenv('NEXT_PUBLIC_SUPABASE_URL')
 SUPABASE_KEY = (
@@ -58,6 +94,33 @@ SUPABASE_KEY = (
     os.getenv('NEXT_PUBLIC_SUPABASE_ANON_KEY')
 )
 
+# Shared keep-alive client for logo downloads (one connection pool instead of a new one per image)
+_http_client = httpx.Client(
+    timeout=10,
+    follow_redirects=True,
+    limits=httpx.Limits(max_connections=50, max_keepalive_connections=20),
+)
+
+# Restaurant logos rarely change; keep downloaded bytes for a few minutes
+LOGO_CACHE_TTL_SECONDS = 300
+_logo_cache = TTLCache(256, LOGO_CACHE_TTL_SECONDS)
+
+
+def _fetch_logo_bytes(logo_url: str) -> bytes:
+    """Download logo via the shared client (cached by URL)"""
+    cached = _logo_cache.get(logo_url)
+    if cached is not None:
+        return cached
+    response = _http_client.get(logo_url)
+    response.raise_for_status()
+    _logo_cache.set(logo_url, response.content)
+    return response.content
+
+
+def _as_image_source(image: Union[bytes, BinaryIO]):
+    """Image.open() source for raw bytes or an already open binary file"""
+    return image if hasattr(image, "read") else io.BytesIO(image)
+
 
 class AIService:
     """
@@ -83,7 +146,7 @@ class AIService:
         self.supabase_client = None
         if SUPABASE_AVAILABLE and SUPABASE_URL and SUPABASE_KEY:
             try:
-                self.supabase_client = create_client(SUPABASE_URL, SUPABASE_KEY)
+                self.supabase_client = get_supabase_client(SUPABASE_URL, SUPABASE_KEY)
                 print("✅ Supabase client initialized for image storage")
             except Exception as e:
                 print(f"⚠️ Failed to initialize Supabase client: {str(e)}")
@@ -102,33 +165,23 @@ class AIService:
             Translated text (or original text if translation fails)
         """
         if not self.ready:
-            print("⚠️ AI Service not ready, returning original text")
+            logger.warning("AI Service not ready, returning original text")
             return text
 
         if not text or not text.strip():
             return text
 
-        try:
-            # Normalize language names
-            lang_normalize = {
-                "English": "English", "en": "English", "EN": "English",
-                "Japanese": "Japanese", "日本語": "Japanese", "ja": "Japanese", "JP": "Japanese",
-                "Thai": "Thai", "ไทย": "Thai", "th": "Thai",
-                "Chinese": "Chinese", "中文": "Chinese", "zh": "Chinese",
-                "Korean": "Korean", "한국어": "Korean", "ko": "Korean",
-                "Vietnamese": "Vietnamese", "Tiếng Việt": "Vietnamese", "vi": "Vietnamese",
-                "Hindi": "Hindi", "हिंदी": "Hindi", "hi": "Hindi",
-                "Spanish": "Spanish", "Español": "Spanish", "es": "Spanish",
-                "French": "French", "Français": "French", "fr": "French",
-                "German": "German", "Deutsch": "German", "de": "German",
-                "Indonesian": "Indonesian", "Bahasa Indonesia": "Indonesian", "id": "Indonesian",
-                "Malay": "Malay", "Bahasa Melayu": "Malay", "ms": "Malay",
-            }
+        # Normalize language names
+        source_lang_normalized = LANG_NORMALIZE.get(source_lang.strip(), source_lang.strip()) if source_lang != "auto" else "auto"
+        target_lang_normalized = LANG_NORMALIZE.get(target_lang.strip(), target_lang.strip())
 
-            source_lang_normalized = lang_normalize.get(source_lang.strip(), source_lang.strip()) if source_lang != "auto" else "auto"
-            target_lang_normalized = lang_normalize.get(target_lang.strip(), target_lang.strip())
+        cached = translation_cache.get(text, source_lang_normalized, target_lang_normalized)
+        if cached is not None:
+            return cached
 
-            print(f"🔄 Translating: '{text[:50]}...' to {target_lang_normalized}")
+        try:
+
+            logger.debug("Translating: %r to %s", text[:50], target_lang_normalized)
 
             # Use higher-quality model for translation, fallback to flash if needed
             model_name = TRANSLATION_MODEL_NAME or TEXT_MODEL_NAME
@@ -170,7 +223,7 @@ Text to translate:
             try:
                 response = run_translation(model_name)
             except Exception as primary_error:
-                print(f"⚠️ Primary translation model '{model_name}' failed, falling back to {TEXT_MODEL_NAME}: {primary_error}")
+                logger.warning("Primary translation model %r failed, falling back to %s: %s", model_name, TEXT_MODEL_NAME, primary_error)
                 response = run_translation(TEXT_MODEL_NAME)
             
             # Extract translated text
@@ -193,17 +246,154 @@ Text to translate:
                     translated = translated[len(prefix):].strip()
             
             if not translated or translated == text:
-                print(f"⚠️ Translation may have failed - returned original text")
+                logger.warning("Translation may have failed - returned original text")
             else:
-                print(f"✅ Successfully translated to {target_lang_normalized}")
+                logger.debug("Successfully translated to %s", target_lang_normalized)
+                translation_cache.set(text, source_lang_normalized, target_lang_normalized, translated)
             
             return translated if translated else text
             
         except Exception as e:
-            print(f"❌ TRANSLATION FAILED: {e}")
-            import traceback
-            traceback.print_exc()
+            logger.exception("TRANSLATION FAILED: %s", e)
             return text  # Silent fallback - return original text
+
+    def translate_texts(self, texts: List[str], target_lang: str, source_lang: str = "auto") -> List[str]:
+        """
+        Translate many texts with one Gemini call per TRANSLATE_STREAM_CHUNK_SIZE texts (batch translation)
+
+        Each chunk is sent as one numbered list and the model returns a JSON array
+        in the same order, so the prompt/RPC overhead is paid once per chunk.
+        A chunk falls back to per-item translate_text if its response cannot be parsed.
+
+        Args:
+            texts: Texts to translate (empty strings are passed through)
+            target_lang: Target language (e.g., "English", "Thai", "ja")
+            source_lang: Source language (default: "auto" for auto-detect)
+
+        Returns:
+            List of translated texts in the same order as input
+        """
+        if not self.ready:
+            logger.warning("AI Service not ready, returning original texts")
+            return list(texts)
+
+        source_lang_normalized = LANG_NORMALIZE.get(source_lang.strip(), source_lang.strip()) if source_lang != "auto" else "auto"
+        target_lang_normalized = LANG_NORMALIZE.get(target_lang.strip(), target_lang.strip())
+
+        # Only send non-empty, uncached texts, remember where they came from
+        results = list(texts)
+        indices = []
+        for i, text in enumerate(texts):
+            if not text or not text.strip():
+                continue
+            cached = translation_cache.get(text, source_lang_normalized, target_lang_normalized)
+            if cached is not None:
+                results[i] = cached
+            else:
+                indices.append(i)
+        if not indices:
+            return results
+
+        # One call per chunk keeps each JSON array well under the model's output limit
+        chunks = [indices[n:n + TRANSLATE_STREAM_CHUNK_SIZE] for n in range(0, len(indices), TRANSLATE_STREAM_CHUNK_SIZE)]
+
+        def translate_chunk(chunk: List[int]) -> None:
+            self._translate_chunk(texts, chunk, results, target_lang, source_lang, source_lang_normalized, target_lang_normalized)
+
+        if len(chunks) == 1:
+            translate_chunk(chunks[0])
+        else:
+            # Chunks write disjoint positions of results, so they can run side by side
+            with ThreadPoolExecutor(max_workers=min(TRANSLATION_CONCURRENCY, len(chunks))) as executor:
+                list(executor.map(translate_chunk, chunks))
+        return results
+
+    def _translate_chunk(
+        self,
+        texts: List[str],
+        indices: List[int],
+        results: List[str],
+        target_lang: str,
+        source_lang: str,
+        source_lang_normalized: str,
+        target_lang_normalized: str,
+    ) -> None:
+        """Translate texts[i] for i in indices with one Gemini call, writing into results (per-item fallback)"""
+        if len(indices) == 1:
+            i = indices[0]
+            results[i] = self.translate_text(texts[i], target_lang, source_lang)
+            return
+
+        try:
+            logger.debug("Batch translating %d texts to %s (one request)", len(indices), target_lang_normalized)
+
+            numbered = "\n".join(
+                f"{n}. {json.dumps(texts[i], ensure_ascii=False)}" for n, i in enumerate(indices, start=1)
+            )
+            prompt = f"""Translate each restaurant menu text below to {target_lang_normalized}.
+
+CRITICAL RULES:
+- Translate to natural, fluent {target_lang_normalized}
+- Use descriptive, appetizing names
+- Professional restaurant style
+- NO symbols, NO parentheses, NO extra explanations
+- Return ONLY a JSON array of {len(indices)} strings, in the same order as the input
+
+Texts to translate:
+{numbered}
+
+JSON array only:"""
+
+            model = genai.GenerativeModel(
+                TRANSLATION_MODEL_NAME or TEXT_MODEL_NAME,
+                system_instruction=(
+                    f"You are a professional translator specializing in restaurant menu translation. "
+                    f"Translate dish names and descriptions to {target_lang_normalized}."
+                ),
+                generation_config={
+                    "temperature": 0.2,
+                    "top_p": 0.9,
+                    "top_k": 40,
+                    "max_output_tokens": min(256 * len(indices), TRANSLATION_MAX_OUTPUT_TOKENS),
+                    "response_mime_type": "application/json",
+                },
+            )
+            response = model.generate_content(prompt)
+            raw = response.text.strip()
+
+            # Remove markdown code blocks if present
+            if '```json' in raw:
+                raw = raw.split('```json')[1].split('```')[0]
+            elif '```' in raw:
+                raw = raw.split('```')[1].split('```')[0]
+
+            translated = json.loads(raw.strip())
+            if not isinstance(translated, list) or len(translated) != len(indices):
+                raise ValueError(f"expected {len(indices)} translations, got {len(translated) if isinstance(translated, list) else type(translated).__name__}")
+
+            for i, value in zip(indices, translated):
+                value = str(value).strip() if value is not None else ""
+                results[i] = value or texts[i]
+                if value and value != texts[i]:
+                    translation_cache.set(texts[i], source_lang_normalized, target_lang_normalized, value)
+
+            logger.debug("Batch translated %d texts to %s", len(indices), target_lang_normalized)
+
+        except Exception as e:
+            logger.warning("Batch translation failed, falling back to per-item: %s", e)
+            # Per-item calls are blocking SDK requests - run them concurrently,
+            # bounded so we stay under the Gemini requests-per-minute quota
+            with ThreadPoolExecutor(max_workers=min(TRANSLATION_CONCURRENCY, len(indices))) as executor:
+                futures = {
+                    i: executor.submit(self.translate_text, texts[i], target_lang, source_lang)
+                    for i in indices
+                }
+                for i, future in futures.items():
+                    try:
+                        results[i] = future.result() or texts[i]
+                    except Exception as item_error:
+                        logger.warning("Translation failed for text %d: %s", i, item_error)
+                        results[i] = texts[i]  # Fallback to original
     
     def generate_menu_image(self, prompt: str) -> Optional[str]:
         """
@@ -268,7 +458,6 @@ Text to translate:
                 
         except Exception as e:
             print(f"❌ Image generation failed: {str(e)}")
-            import traceback
             traceback.print_exc()
             return None
     
@@ -358,7 +547,7 @@ Text to translate:
                 response = self.supabase_client.storage.from_(bucket_name).upload(
                     path=filename,
                     file=optimized_bytes,
-                    file_options={"content-type": "image/webp", "upsert": "false"}
+                    file_options={"content-type": "image/webp", "cache-control": IMMUTABLE_CACHE_SECONDS, "upsert": "false"}
                 )
             except Exception as upload_error:
                 # Retry with upsert=true
@@ -366,7 +555,7 @@ Text to translate:
                     response = self.supabase_client.storage.from_(bucket_name).upload(
                         path=filename,
                         file=optimized_bytes,
-                        file_options={"content-type": "image/webp", "upsert": "true"}
+                        file_options={"content-type": "image/webp", "cache-control": IMMUTABLE_CACHE_SECONDS, "upsert": "true"}
                     )
                 except Exception as retry_error:
                     print(f"❌ Upload failed: {str(retry_error)}")
@@ -400,14 +589,17 @@ Text to translate:
             
         except Exception as e:
             print(f"❌ Failed to upload image to Supabase: {str(e)}")
-            import traceback
             traceback.print_exc()
             return None
     
     # Compatibility methods for existing code
     async def translate(self, text: str, source_lang: str, target_lang: str = "English") -> str:
-        """Async wrapper for translate_text (for backward compatibility)"""
-        return self.translate_text(text, target_lang, source_lang)
+        """Async wrapper for translate_text (for backward compatibility) - runs in a worker thread"""
+        return await asyncio.to_thread(self.translate_text, text, target_lang, source_lang)
+
+    async def translate_many(self, texts: List[str], source_lang: str, target_lang: str = "English") -> List[str]:
+        """Async wrapper for translate_texts (one AI call for the whole batch) - runs in a worker thread"""
+        return await asyncio.to_thread(self.translate_texts, texts, target_lang, source_lang)
     
     async def detect_language(self, text: str) -> str:
         """
@@ -421,6 +613,10 @@ Text to translate:
         """
         if not self.ready:
             return "Unknown"
+
+        cached = translation_cache.get(text, "detect", "")
+        if cached is not None:
+            return cached
         
         try:
             model = genai.GenerativeModel(TEXT_MODEL_NAME)
@@ -429,11 +625,14 @@ Text to translate:
 Return ONLY the language name in English (e.g. "Thai", "Chinese", "Korean", "Japanese", "Vietnamese", etc.)
 No explanations, just the language name."""
             
-            response = model.generate_content(prompt)
+            # Blocking SDK call - keep it off the event loop
+            response = await asyncio.to_thread(model.generate_content, prompt)
             language = response.text.strip()
+            if language:
+                translation_cache.set(text, "detect", "", language)
             return language if language else "Unknown"
         except Exception as e:
-            print(f"❌ Language detection error: {str(e)}")
+            logger.warning("Language detection error: %s", e)
             return "Unknown"
     
     async def generate_description(self, dish_name: str, language: str = "English", max_words: int = 50) -> str:
@@ -523,7 +722,6 @@ Just return the JSON array, no additional text."""
             extracted_text = response.text
             
             # Try to parse as JSON
-            import json
             try:
                 # Remove markdown code blocks if present
                 if '```json' in extracted_text:
@@ -547,16 +745,15 @@ Just return the JSON array, no additional text."""
                 }
         except Exception as e:
             print(f"❌ Menu analysis error: {str(e)}")
-            import traceback
             traceback.print_exc()
             return {"success": False, "error": str(e)}
     
-    def enhance_image_with_ai(self, image_bytes: bytes, style: str = "professional", user_instruction: Optional[str] = None, logo_overlay: Optional[Dict[str, Any]] = None, user_plan: str = "free_trial") -> Dict[str, Any]:
+    def enhance_image_with_ai(self, image_bytes: Union[bytes, BinaryIO], style: str = "professional", user_instruction: Optional[str] = None, logo_overlay: Optional[Dict[str, Any]] = None, user_plan: str = "free_trial") -> Dict[str, Any]:
         """
         Enhance food photo using AI
 
         Args:
-            image_bytes: Raw image bytes
+            image_bytes: Raw image bytes (or a binary file object, e.g. a spooled upload)
             style: Enhancement style (professional, natural, vibrant)
             user_instruction: Optional custom instruction
             logo_overlay: Optional dict with {'enabled': bool, 'logo_url': str, 'position': str}
@@ -569,7 +766,7 @@ Just return the JSON array, no additional text."""
             return {"success": False, "error": "AI Service not ready"}
         
         try:
-            image = Image.open(io.BytesIO(image_bytes))
+            image = Image.open(_as_image_source(image_bytes))
             
             enhancement_prompt = f"""ทำภาพนี้ให้เป็นภาพถ่ายอาหารระดับมืออาชีพ แสงไฟสตูดิโอ จัดองค์ประกอบภาพใหม่ให้ดูน่าทานที่สุด ความละเอียด 4K โดยยังคงรักษาหน้าตาของอาหารจานเดิมไว้
             
@@ -700,7 +897,6 @@ Requirements:
                 }
         except Exception as e:
             print(f"❌ Image enhancement failed: {str(e)}")
-            import traceback
             traceback.print_exc()
             return {"success": False, "error": str(e)}
     
@@ -868,7 +1064,6 @@ Return ONLY the optimized prompt, no explanations."""
             }
         except Exception as e:
             print(f"❌ Image generation failed: {str(e)}")
-            import traceback
             traceback.print_exc()
             return {"success": False, "error": str(e)}
     
@@ -891,8 +1086,7 @@ Return ONLY the optimized prompt, no explanations."""
             
             # Download logo from URL
             if logo_url.startswith('http'):
-                response = requests.get(logo_url, timeout=10)
-                logo = Image.open(io.BytesIO(response.content))
+                logo = Image.open(io.BytesIO(_fetch_logo_bytes(logo_url)))
             else:
                 logo = Image.open(logo_url)
             
@@ -1098,7 +1292,6 @@ Return ONLY the optimized prompt, no explanations."""
 
         except Exception as e:
             print(f"⚠️ Logo watermark failed: {str(e)}")
-            import traceback
             traceback.print_exc()
             # Return original image if watermark fails
             return image
@@ -1107,13 +1300,13 @@ Return ONLY the optimized prompt, no explanations."""
         """Public method for uploading images to Supabase"""
         return self._upload_image_to_supabase(image_base64, bucket_name, folder)
 
-    def apply_logo_only(self, image_bytes: bytes, logo_url: str, position: str = 'top-right', logo_size: str = 'medium') -> Dict[str, Any]:
+    def apply_logo_only(self, image_bytes: Union[bytes, BinaryIO], logo_url: str, position: str = 'top-right', logo_size: str = 'medium') -> Dict[str, Any]:
         """
         Apply logo overlay to an image WITHOUT any AI enhancement or modification.
         This is a simple logo placement function - no sharpening, no contrast, no AI.
 
         Args:
-            image_bytes: Raw image bytes
+            image_bytes: Raw image bytes (or a binary file object, e.g. a spooled upload)
             logo_url: URL of the restaurant logo
             position: Position of logo ('top-left', 'top-center', 'top-right', 'bottom-left', 'bottom-center', 'bottom-right')
             logo_size: Size of logo ('small', 'medium', 'large') - default 'medium'
@@ -1125,7 +1318,7 @@ Return ONLY the optimized prompt, no explanations."""
             print(f"🎨 Applying logo ONLY (no enhancement) at position: {position}")
 
             # Open the original image
-            image = Image.open(io.BytesIO(image_bytes))
+            image = Image.open(_as_image_source(image_bytes))
 
             # Ensure image is in RGB mode for consistent output
             if image.mode in ('RGBA', 'LA', 'P'):
@@ -1159,7 +1352,7 @@ Return ONLY the optimized prompt, no explanations."""
                     response = self.supabase_client.storage.from_("menu-images").upload(
                         path=filename,
                         file=image_bytes_result,
-                        file_options={"content-type": "image/webp", "upsert": "true"}
+                        file_options={"content-type": "image/webp", "cache-control": IMMUTABLE_CACHE_SECONDS, "upsert": "true"}
                     )
 
                     # Get public URL
@@ -1203,7 +1396,6 @@ Return ONLY the optimized prompt, no explanations."""
 
         except Exception as e:
             print(f"❌ Apply logo failed: {str(e)}")
-            import traceback
             traceback.print_exc()
             return {"success": False, "error": str(e)}
     
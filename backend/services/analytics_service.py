@@ -16,7 +16,7 @@ class AnalyticsService:
     
     def __init__(self):
         try:
-            from supabase import create_client
+            from .supabase_client import get_supabase_client
             supabase_url = os.getenv('SUPABASE_URL') or os.getenv('NEXT_PUBLIC_SUPABASE_URL')
             supabase_key = (
                 os.getenv('SUPABASE_SERVICE_ROLE_KEY') or 
@@ -25,7 +25,7 @@ class AnalyticsService:
             )
             
             if supabase_url and supabase_key:
-                self.supabase = create_client(supabase_url, supabase_key)
+                self.supabase = get_supabase_client(supabase_url, supabase_key)
                 print("✅ Analytics Service: Supabase client initialized")
             else:
                 self.supabase = None
@@ -3,12 +3,22 @@ Best Sellers Service - คำนวณเมนูขายดีจากยอ
 """
 
 import os
+import asyncio
 from typing import List, Dict, Any, Optional
-from supabase import create_client, Client
+from supabase import Client
+from postgrest.exceptions import APIError
 from dotenv import load_dotenv
 import pathlib
-import re
+import logging
 from datetime import datetime, timedelta
+from decimal import Decimal, ROUND_HALF_UP
+
+from .supabase_client import get_supabase_client, MISSING_FUNCTION_ERROR_CODES
+from .menu_service import menu_service
+from .ttl_cache import TTLCache
+from .ids import is_uuid
+
+logger = logging.getLogger(__name__)
 
 # Load environment variables
 env_path = pathlib.Path(__file__).parent.parent.parent / '.env'
@@ -24,14 +34,29 @@ SUPABASE_KEY = (
     os.getenv('NEXT_PUBLIC_SUPABASE_ANON_KEY')
 )
 
+# Rankings cover days of orders, so a minute-old result is fine for the customer menu page
+# (pin changes from the menu editor also show up within this window)
+BEST_SELLERS_CACHE_TTL_SECONDS = 60
+
+# Restaurants updated at once by the cron job (each holds a worker thread + Supabase connection)
+BESTSELLER_UPDATE_CONCURRENCY = int(os.getenv('BESTSELLER_UPDATE_CONCURRENCY', '8'))
+
+
+def _round_quantity(quantity: Any) -> int:
+    """Line-item quantity as an int, rounded like Postgres ROUND(numeric) ("2.0" -> 2, 2.5 -> 3)"""
+    return int(Decimal(str(quantity)).quantize(Decimal(1), rounding=ROUND_HALF_UP))
+
+
 class BestSellersService:
     """Service for calculating best selling menu items"""
     
     def __init__(self):
+        # (restaurant_id, days, limit) → ranked best sellers
+        self._cache = TTLCache(1024, BEST_SELLERS_CACHE_TTL_SECONDS)
         self.supabase_client: Optional[Client] = None
         if SUPABASE_URL and SUPABASE_KEY:
             try:
-                self.supabase_client = create_client(SUPABASE_URL, SUPABASE_KEY)
+                self.supabase_client = get_supabase_client(SUPABASE_URL, SUPABASE_KEY)
                 print("✅ Best Sellers Service: Supabase client initialized")
             except Exception as e:
                 print(f"⚠️ Best Sellers Service: Failed to initialize Supabase client: {str(e)}")
@@ -41,11 +66,7 @@ class BestSellersService:
     
     def _is_valid_uuid(self, uuid_string: str) -> bool:
         """ตรวจสอบว่า string เป็น UUID format หรือไม่"""
-        uuid_pattern = re.compile(
-            r'^[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}$',
-            re.IGNORECASE
-        )
-        return bool(uuid_pattern.match(uuid_string))
+        return is_uuid(uuid_string)
     
     def get_best_sellers(
         self,
@@ -63,7 +84,8 @@ class BestSellersService:
             limit: จำนวนเมนูที่ต้องการ (default: 5)
 
         Returns:
-            List of best selling menu items with sales count
+            List of best selling menu items with sales count. Cached for
+            BEST_SELLERS_CACHE_TTL_SECONDS and shared between callers - do not mutate.
         """
         if not self.supabase_client:
             return []
@@ -71,134 +93,178 @@ class BestSellersService:
         if not self._is_valid_uuid(restaurant_id):
             return []
 
+        key = (restaurant_id, days, limit)
+        top_items = self._cache.get(key)
+        if top_items is not None:
+            return top_items
+
         try:
-            # Calculate date range
-            end_date = datetime.now()
-            start_date = end_date - timedelta(days=days)
-
-            # Get pinned bestsellers (manually marked)
-            pinned_result = self.supabase_client.table('menus').select(
-                'id, name_original, name_english, image_url, price, category, is_best_seller'
-            ).eq('restaurant_id', restaurant_id).eq('is_best_seller', True).eq('is_active', True).execute()
-
-            pinned_menus = {menu['id']: menu for menu in (pinned_result.data or [])}
-
-            # Get all orders from the last N days (including pending/confirmed orders)
-            orders_result = self.supabase_client.table('orders').select(
-                'items, status'
-            ).eq('restaurant_id', restaurant_id).gte(
-                'created_at', start_date.isoformat()
-            ).lte(
-                'created_at', end_date.isoformat()
-            ).neq('status', 'cancelled').execute()
-
-            # Count menu item sales
-            menu_sales: Dict[str, Dict[str, Any]] = {}
-
-            # Initialize pinned menus with 0 sales (they will show even without orders)
-            for menu_id, menu in pinned_menus.items():
+            top_items = self._calculate_best_sellers(restaurant_id, days, limit)
+        except Exception:
+            logger.exception("Failed to calculate best sellers")
+            return []
+
+        self._cache.set(key, top_items)
+        return top_items
+
+    def _get_menu_sales(self, restaurant_id: str, start_date: datetime, end_date: datetime) -> List[Dict[str, Any]]:
+        """
+        ยอดขายรวมต่อเมนูในช่วงเวลา (menu_id, name, nameEn, total_quantity, order_count)
+
+        Aggregated in Postgres (migration: supabase/migrations/add_get_best_seller_sales_function.sql);
+        falls back to downloading the orders and counting here if the function is missing.
+        """
+        try:
+            result = self.supabase_client.rpc('get_best_seller_sales', {
+                'p_restaurant_id': restaurant_id,
+                'p_start': start_date.isoformat(),
+                'p_end': end_date.isoformat(),
+            }).execute()
+            return result.data or []
+        except APIError as e:
+            # Only a missing function falls back - other errors (timeouts, bad data) propagate
+            if e.code not in MISSING_FUNCTION_ERROR_CODES:
+                raise
+            logger.warning("get_best_seller_sales RPC unavailable, counting orders here: %s", e)
+
+        orders_result = self.supabase_client.table('orders').select(
+            'items, status'
+        ).eq('restaurant_id', restaurant_id).gte(
+            'created_at', start_date.isoformat()
+        ).lte(
+            'created_at', end_date.isoformat()
+        ).neq('status', 'cancelled').execute()
+
+        menu_sales: Dict[str, Dict[str, Any]] = {}
+        for order in (orders_result.data or []):
+            items = order.get('items', [])
+            if not isinstance(items, list):
+                continue
+
+            for item in items:
+                menu_id = item.get('menu_id')
+                if not menu_id:
+                    continue
+
+                if menu_id not in menu_sales:
+                    menu_sales[menu_id] = {
+                        'menu_id': menu_id,
+                        'name': item.get('name', ''),
+                        'nameEn': item.get('nameEn', ''),
+                        'total_quantity': 0,
+                        'order_count': 0,
+                    }
+
+                quantity = item.get('quantity')
+                menu_sales[menu_id]['total_quantity'] += 1 if quantity in (None, '') else _round_quantity(quantity)
+                menu_sales[menu_id]['order_count'] += 1
+
+        return list(menu_sales.values())
+
+    def _calculate_best_sellers(self, restaurant_id: str, days: int, limit: int) -> List[Dict[str, Any]]:
+        """Aggregate the last N days of orders (uncached, raises on Supabase errors)"""
+        # Calculate date range
+        end_date = datetime.now()
+        start_date = end_date - timedelta(days=days)
+
+        # Get pinned bestsellers (manually marked)
+        pinned_result = self.supabase_client.table('menus').select(
+            'id, name_original, name_english, image_url, price, category, is_best_seller'
+        ).eq('restaurant_id', restaurant_id).eq('is_best_seller', True).eq('is_active', True).execute()
+
+        pinned_menus = {menu['id']: menu for menu in (pinned_result.data or [])}
+
+        # Count menu item sales
+        menu_sales: Dict[str, Dict[str, Any]] = {}
+
+        # Initialize pinned menus with 0 sales (they will show even without orders)
+        for menu_id, menu in pinned_menus.items():
+            menu_sales[menu_id] = {
+                'menu_id': menu_id,
+                'name': menu.get('name_original', ''),
+                'nameEn': menu.get('name_english', ''),
+                'total_quantity': 0,
+                'order_count': 0,
+                'is_pinned': True,
+                'image_url': menu.get('image_url'),
+                'price': str(menu.get('price', 0)),
+                'category': menu.get('category', 'Main Course'),
+            }
+
+        # Add sales from the last N days (including pending/confirmed orders)
+        for sales in self._get_menu_sales(restaurant_id, start_date, end_date):
+            menu_id = sales['menu_id']
+            if menu_id not in menu_sales:
                 menu_sales[menu_id] = {
                     'menu_id': menu_id,
-                    'name': menu.get('name_original', ''),
-                    'nameEn': menu.get('name_english', ''),
+                    'name': sales['name'],
+                    'nameEn': sales['nameEn'],
                     'total_quantity': 0,
                     'order_count': 0,
-                    'is_pinned': True,
-                    'image_url': menu.get('image_url'),
-                    'price': str(menu.get('price', 0)),
-                    'category': menu.get('category', 'Main Course'),
+                    'is_pinned': False,
                 }
 
-            # Count sales from orders
-            for order in (orders_result.data or []):
-                items = order.get('items', [])
-                if not isinstance(items, list):
-                    continue
-
-                for item in items:
-                    menu_id = item.get('menu_id')
-                    if not menu_id:
-                        continue
-
-                    quantity = item.get('quantity', 1)
-
-                    if menu_id not in menu_sales:
-                        menu_sales[menu_id] = {
-                            'menu_id': menu_id,
-                            'name': item.get('name', ''),
-                            'nameEn': item.get('nameEn', ''),
-                            'total_quantity': 0,
-                            'order_count': 0,
-                            'is_pinned': False,
-                        }
-
-                    menu_sales[menu_id]['total_quantity'] += quantity
-                    menu_sales[menu_id]['order_count'] += 1
-
-            # Sort priority:
-            # 1. Items with quantity >= 20 (sorted by quantity desc)
-            # 2. Pinned items by owner
-            # 3. Items with quantity < 20 (sorted by quantity desc)
-            MIN_QUANTITY_THRESHOLD = 20  # Minimum orders to be ranked above pinned items
-
-            def sort_key(x):
-                quantity = x['total_quantity']
-                is_pinned = x.get('is_pinned', False)
-
-                # Priority groups:
-                # 0 = high quantity (>= 20), 1 = pinned, 2 = low quantity (< 20)
-                if quantity >= MIN_QUANTITY_THRESHOLD:
-                    priority = 0  # High quantity first
-                elif is_pinned:
-                    priority = 1  # Pinned second
-                else:
-                    priority = 2  # Low quantity last
-
-                return (priority, -quantity, -x['order_count'])
-
-            sorted_items = sorted(menu_sales.values(), key=sort_key)
-
-            # Get top N items
-            top_items = sorted_items[:limit]
-
-            # Fetch missing menu details for non-pinned items
-            menu_ids_need_details = [
-                item['menu_id'] for item in top_items
-                if item['menu_id'] not in pinned_menus and 'image_url' not in item
-            ]
-
-            if menu_ids_need_details:
-                menus_result = self.supabase_client.table('menus').select(
-                    'id, name_original, name_english, image_url, price, category'
-                ).in_('id', menu_ids_need_details).execute()
-
-                if menus_result.data:
-                    menu_details = {menu['id']: menu for menu in menus_result.data}
-
-                    for item in top_items:
-                        menu_id = item['menu_id']
-                        if menu_id in menu_details:
-                            details = menu_details[menu_id]
-                            item['image_url'] = details.get('image_url')
-                            item['price'] = str(details.get('price', 0))
-                            item['category'] = details.get('category', 'Main Course')
-                            if not item['name']:
-                                item['name'] = details.get('name_original', '')
-                            if not item['nameEn']:
-                                item['nameEn'] = details.get('name_english', '')
-
-            # Add rank to each item
-            for idx, item in enumerate(top_items):
-                item['rank'] = idx + 1
-
-            print(f"✅ Best Sellers: Found {len(top_items)} top items for restaurant {restaurant_id} (pinned: {len(pinned_menus)})")
-            return top_items
-
-        except Exception as e:
-            print(f"❌ Best Sellers Service: Failed to calculate best sellers: {str(e)}")
-            import traceback
-            traceback.print_exc()
-            return []
+            menu_sales[menu_id]['total_quantity'] += sales['total_quantity']
+            menu_sales[menu_id]['order_count'] += sales['order_count']
+
+        # Sort priority:
+        # 1. Items with quantity >= 20 (sorted by quantity desc)
+        # 2. Pinned items by owner
+        # 3. Items with quantity < 20 (sorted by quantity desc)
+        MIN_QUANTITY_THRESHOLD = 20  # Minimum orders to be ranked above pinned items
+
+        def sort_key(x):
+            quantity = x['total_quantity']
+            is_pinned = x.get('is_pinned', False)
+
+            # Priority groups:
+            # 0 = high quantity (>= 20), 1 = pinned, 2 = low quantity (< 20)
+            if quantity >= MIN_QUANTITY_THRESHOLD:
+                priority = 0  # High quantity first
+            elif is_pinned:
+                priority = 1  # Pinned second
+            else:
+                priority = 2  # Low quantity last
+
+            return (priority, -quantity, -x['order_count'])
+
+        sorted_items = sorted(menu_sales.values(), key=sort_key)
+
+        # Get top N items
+        top_items = sorted_items[:limit]
+
+        # Fetch missing menu details for non-pinned items
+        menu_ids_need_details = [
+            item['menu_id'] for item in top_items
+            if item['menu_id'] not in pinned_menus and 'image_url' not in item
+        ]
+
+        if menu_ids_need_details:
+            menus_result = self.supabase_client.table('menus').select(
+                'id, name_original, name_english, image_url, price, category'
+            ).in_('id', menu_ids_need_details).execute()
+
+            if menus_result.data:
+                menu_details = {menu['id']: menu for menu in menus_result.data}
+
+                for item in top_items:
+                    menu_id = item['menu_id']
+                    if menu_id in menu_details:
+                        details = menu_details[menu_id]
+                        item['image_url'] = details.get('image_url')
+                        item['price'] = str(details.get('price', 0))
+                        item['category'] = details.get('category', 'Main Course')
+                        if not item['name']:
+                            item['name'] = details.get('name_original', '')
+                        if not item['nameEn']:
+                            item['nameEn'] = details.get('name_english', '')
+
+        # Add rank to each item
+        for idx, item in enumerate(top_items):
+            item['rank'] = idx + 1
+
+        logger.info("Found %s top items for restaurant %s (pinned: %s)", len(top_items), restaurant_id, len(pinned_menus))
+        return top_items
 
     def update_bestseller_flags(self, restaurant_id: str, days: int = 14) -> Dict[str, Any]:
         """
@@ -219,23 +285,20 @@ class BestSellersService:
             return {'success': False, 'error': 'Invalid restaurant ID'}
 
         try:
-            # Get current bestsellers
-            current_bestsellers = self.get_best_sellers(restaurant_id, days=days, limit=5)
+            # Get current bestsellers (fresh, not the cached ranking)
+            current_bestsellers = self._calculate_best_sellers(restaurant_id, days=days, limit=5)
             current_ids = {item['menu_id'] for item in current_bestsellers}
 
-            # Get pinned menus (these should always stay as bestsellers)
-            pinned_result = self.supabase_client.table('menus').select('id').eq(
-                'restaurant_id', restaurant_id
-            ).eq('is_best_seller', True).execute()
-
-            pinned_ids = {menu['id'] for menu in (pinned_result.data or [])}
-
             # Get all menus for this restaurant
             all_menus = self.supabase_client.table('menus').select('id, is_best_seller').eq(
                 'restaurant_id', restaurant_id
             ).execute()
 
-            updated_count = 0
+            # Pinned menus (these should always stay as bestsellers)
+            pinned_ids = {menu['id'] for menu in (all_menus.data or []) if menu.get('is_best_seller') is True}
+
+            # new flag value → menu IDs, written with one UPDATE per value
+            changes: Dict[bool, List[str]] = {True: [], False: []}
 
             for menu in (all_menus.data or []):
                 menu_id = menu['id']
@@ -250,12 +313,21 @@ class BestSellersService:
                     if menu_id in pinned_ids:
                         continue
 
+                    changes[should_be_bestseller].append(menu_id)
+
+            for is_best_seller, menu_ids in changes.items():
+                if menu_ids:
                     self.supabase_client.table('menus').update({
-                        'is_best_seller': should_be_bestseller
-                    }).eq('id', menu_id).execute()
-                    updated_count += 1
+                        'is_best_seller': is_best_seller
+                    }).in_('id', menu_ids).execute()
+
+            updated_count = len(changes[True]) + len(changes[False])
 
-            print(f"✅ Updated bestseller flags for restaurant {restaurant_id}: {updated_count} changes")
+            if updated_count:
+                menu_service.invalidate_restaurant(restaurant_id)
+                self._cache.clear()
+
+            logger.info("Updated bestseller flags for restaurant %s: %s changes", restaurant_id, updated_count)
 
             return {
                 'success': True,
@@ -266,14 +338,13 @@ class BestSellersService:
             }
 
         except Exception as e:
-            print(f"❌ Failed to update bestseller flags: {str(e)}")
-            import traceback
-            traceback.print_exc()
+            logger.exception("Failed to update bestseller flags")
             return {'success': False, 'error': str(e)}
 
-    def update_all_restaurants_bestsellers(self, days: int = 14) -> Dict[str, Any]:
+    async def update_all_restaurants_bestsellers(self, days: int = 14) -> Dict[str, Any]:
         """
         อัพเดท bestseller flags สำหรับทุกร้าน (เรียกจาก cron job)
+        Restaurants are processed concurrently, at most BESTSELLER_UPDATE_CONCURRENCY at a time
 
         Args:
             days: จำนวนวันย้อนหลัง (default: 14)
@@ -286,20 +357,27 @@ class BestSellersService:
 
         try:
             # Get all active restaurants
-            restaurants = self.supabase_client.table('restaurants').select('id, name').execute()
+            restaurants = await asyncio.to_thread(
+                self.supabase_client.table('restaurants').select('id, name').execute
+            )
+
+            semaphore = asyncio.Semaphore(BESTSELLER_UPDATE_CONCURRENCY)
 
-            results = []
-            for restaurant in (restaurants.data or []):
-                result = self.update_bestseller_flags(restaurant['id'], days=days)
-                results.append({
+            async def update_one(restaurant: Dict[str, Any]) -> Dict[str, Any]:
+                async with semaphore:
+                    result = await asyncio.to_thread(self.update_bestseller_flags, restaurant['id'], days)
+                return {
                     'restaurant_id': restaurant['id'],
                     'restaurant_name': restaurant['name'],
                     **result
-                })
+                }
+
+            # update_bestseller_flags reports its own failures, so one restaurant can't fail the batch
+            results = await asyncio.gather(*(update_one(r) for r in (restaurants.data or [])))
 
             success_count = sum(1 for r in results if r.get('success'))
 
-            print(f"✅ Updated bestsellers for {success_count}/{len(results)} restaurants")
+            logger.info("Updated bestsellers for %s/%s restaurants", success_count, len(results))
 
             return {
                 'success': True,
@@ -309,9 +387,7 @@ class BestSellersService:
             }
 
         except Exception as e:
-            print(f"❌ Failed to update all restaurants bestsellers: {str(e)}")
-            import traceback
-            traceback.print_exc()
+            logger.exception("Failed to update all restaurants bestsellers")
             return {'success': False, 'error': str(e)}
 
 # Create singleton instance
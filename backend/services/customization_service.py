@@ -2,21 +2,44 @@
 Customization Service - จัดการ Theme Color และ Cover Image สำหรับร้านค้า
 """
 import os
-import base64
-import uuid
-from datetime import datetime
+import asyncio
+import functools
+import hashlib
 from typing import Optional, Dict, Any
 from dotenv import load_dotenv
 import pathlib
+import logging
+import re
 
 # Supabase for image storage
 try:
-    from supabase import create_client, Client
+    from supabase import Client
+    from .supabase_client import get_supabase_client
     SUPABASE_AVAILABLE = True
 except ImportError:
     SUPABASE_AVAILABLE = False
     print("⚠️ Supabase library not available. Install with: pip install supabase")
 
+from .storage_objects import IMMUTABLE_CACHE_SECONDS, remove_superseded_objects
+
+logger = logging.getLogger(__name__)
+
+# Theme color: RRGGBB hex digits with optional leading '#'
+HEX_COLOR_PATTERN = re.compile(r'#?[0-9A-Fa-f]{6}')
+
+
+# Restaurants mostly pick from the same few brand colors - memoize per color string
+@functools.lru_cache(maxsize=1024)
+def _is_hex_color(color: str) -> bool:
+    return bool(color) and HEX_COLOR_PATTERN.fullmatch(color) is not None
+
+
+@functools.lru_cache(maxsize=1024)
+def _normalize_hex_color(color: str) -> str:
+    if not _is_hex_color(color):
+        return '#000000'  # Default fallback
+    return '#' + color.lstrip('#').upper()
+
 # Load environment variables
 env_path = pathlib.Path(__file__).parent.parent.parent / '.env'
 if env_path.exists():
@@ -39,7 +62,7 @@ class CustomizationService:
         self.supabase_client = None
         if SUPABASE_AVAILABLE and SUPABASE_URL and SUPABASE_KEY:
             try:
-                self.supabase_client = create_client(SUPABASE_URL, SUPABASE_KEY)
+                self.supabase_client = get_supabase_client(SUPABASE_URL, SUPABASE_KEY)
                 print("✅ Customization Service initialized with Supabase")
             except Exception as e:
                 print(f"⚠️ Failed to initialize Supabase client: {str(e)}")
@@ -57,22 +80,7 @@ class CustomizationService:
         Returns:
             True if valid, False otherwise
         """
-        if not color:
-            return False
-        
-        # Remove # if present
-        color = color.lstrip('#')
-        
-        # Check if it's a valid hex color (6 characters)
-        if len(color) != 6:
-            return False
-        
-        # Check if all characters are valid hex digits
-        try:
-            int(color, 16)
-            return True
-        except ValueError:
-            return False
+        return _is_hex_color(color)
     
     def normalize_theme_color(self, color: str) -> str:
         """
@@ -84,144 +92,51 @@ class CustomizationService:
         Returns:
             Normalized hex color with # prefix
         """
-        if not color:
-            return '#000000'
-        
-        # Remove # if present
-        color = color.lstrip('#').upper()
-        
-        # Validate and return with #
-        if self.validate_theme_color('#' + color):
-            return '#' + color
-        
-        return '#000000'  # Default fallback
+        return _normalize_hex_color(color)
     
-    async def upload_logo(self, image_base64: str, restaurant_id: str, content_type: str = "image/png") -> Optional[str]:
+    async def upload_logo(self, image_bytes: bytes, restaurant_id: str, content_type: str = "image/png") -> Optional[str]:
         """
         Upload logo to Supabase Storage
         
         Args:
-            image_base64: Base64 encoded image
+            image_bytes: Raw image bytes
             restaurant_id: Restaurant ID
             content_type: MIME type of the image
             
         Returns:
             Public URL of uploaded image, or None if failed
         """
-        if not self.supabase_client:
-            print("⚠️ Supabase client not available. Skipping upload.")
-            return None
-        
-        try:
-            # Remove data URL prefix if present
-            if ',' in image_base64:
-                image_base64 = image_base64.split(',')[1]
-            
-            # Decode base64 to bytes
-            image_bytes = base64.b64decode(image_base64)
-            
-            # Generate unique filename
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            random_id = str(uuid.uuid4())[:8]
-            
-            # Determine file extension from content type
-            ext = "png"
-            if "jpeg" in content_type or "jpg" in content_type:
-                ext = "jpg"
-            elif "webp" in content_type:
-                ext = "webp"
-            elif "gif" in content_type:
-                ext = "gif"
-            
-            filename = f"logos/{restaurant_id}_{timestamp}_{random_id}.{ext}"
-            
-            print(f"📤 Uploading logo to Supabase Storage:")
-            print(f"   Bucket: shop_assets")
-            print(f"   Filename: {filename}")
-            print(f"   File size: {len(image_bytes)} bytes")
-            print(f"   Content type: {content_type}")
-            
-            # Upload to Supabase Storage
-            try:
-                response = self.supabase_client.storage.from_('shop_assets').upload(
-                    path=filename,
-                    file=image_bytes,
-                    file_options={"content-type": content_type, "upsert": "true"}
-                )
-                print(f"   Upload response: {response}")
-            except Exception as upload_error:
-                print(f"❌ Upload failed: {str(upload_error)}")
-                import traceback
-                traceback.print_exc()
-                return None
-            
-            # Get public URL
-            try:
-                public_url_response = self.supabase_client.storage.from_('shop_assets').get_public_url(filename)
-                
-                # Handle different response formats
-                if isinstance(public_url_response, dict):
-                    public_url = public_url_response.get('publicUrl') or public_url_response.get('public_url') or str(public_url_response)
-                elif isinstance(public_url_response, str):
-                    public_url = public_url_response
-                else:
-                    public_url = getattr(public_url_response, 'publicUrl', None) or getattr(public_url_response, 'public_url', None) or str(public_url_response)
-                
-                if not public_url:
-                    # Fallback: construct URL manually
-                    supabase_url = SUPABASE_URL.rstrip('/')
-                    if not supabase_url.endswith('/storage/v1'):
-                        supabase_url = f"{supabase_url}/storage/v1"
-                    public_url = f"{supabase_url}/object/public/shop_assets/{filename}"
-                    print(f"   Using fallback URL: {public_url}")
-                
-                print(f"✅ Logo uploaded successfully: {public_url}")
-                return public_url
-            except Exception as url_error:
-                print(f"❌ Failed to get public URL: {str(url_error)}")
-                import traceback
-                traceback.print_exc()
-                # Fallback: construct URL manually
-                supabase_url = SUPABASE_URL.rstrip('/')
-                if not supabase_url.endswith('/storage/v1'):
-                    supabase_url = f"{supabase_url}/storage/v1"
-                public_url = f"{supabase_url}/object/public/shop_assets/{filename}"
-                print(f"   Using fallback URL: {public_url}")
-                return public_url
-            
-        except Exception as e:
-            print(f"❌ Failed to upload logo: {str(e)}")
-            import traceback
-            traceback.print_exc()
-            return None
+        return await self._upload_shop_asset(image_bytes, "logos", "logo", restaurant_id, content_type)
     
-    async def upload_cover_image(self, image_base64: str, restaurant_id: str, content_type: str = "image/png") -> Optional[str]:
+    async def upload_cover_image(self, image_bytes: bytes, restaurant_id: str, content_type: str = "image/png") -> Optional[str]:
         """
         Upload cover image to Supabase Storage
         
         Args:
-            image_base64: Base64 encoded image
+            image_bytes: Raw image bytes
             restaurant_id: Restaurant ID
             content_type: MIME type of the image
             
+        Returns:
+            Public URL of uploaded image, or None if failed
+        """
+        return await self._upload_shop_asset(image_bytes, "covers", "cover image", restaurant_id, content_type)
+    
+    async def _upload_shop_asset(self, image_bytes: bytes, folder: str, label: str, restaurant_id: str, content_type: str) -> Optional[str]:
+        """
+        อัปโหลดไฟล์รูปไปที่ bucket shop_assets/<folder> (bytes ส่งตรงให้ storage client ไม่ต้องแปลง base64)
+        
         Returns:
             Public URL of uploaded image, or None if failed
         """
         if not self.supabase_client:
-            print("⚠️ Supabase client not available. Skipping upload.")
+            logger.warning("Supabase client not available. Skipping upload.")
             return None
         
         try:
-            # Remove data URL prefix if present
-            if ',' in image_base64:
-                image_base64 = image_base64.split(',')[1]
-            
-            # Decode base64 to bytes
-            image_bytes = base64.b64decode(image_base64)
-            
-            # Generate unique filename
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            random_id = str(uuid.uuid4())[:8]
+            # Content-hash filename: a new image always gets a new URL, so the CDN copy
+            # can be cached forever (re-uploading the same image reuses the object)
+            content_hash = hashlib.sha256(image_bytes).hexdigest()[:16]
             
             # Determine file extension from content type
             ext = "png"
@@ -232,26 +147,24 @@ class CustomizationService:
             elif "gif" in content_type:
                 ext = "gif"
             
-            filename = f"covers/{restaurant_id}_{timestamp}_{random_id}.{ext}"
+            filename = f"{folder}/{restaurant_id}_{content_hash}.{ext}"
             
-            print(f"📤 Uploading cover image to Supabase Storage:")
-            print(f"   Bucket: shop_assets")
-            print(f"   Filename: {filename}")
-            print(f"   File size: {len(image_bytes)} bytes")
-            print(f"   Content type: {content_type}")
+            logger.debug(
+                "Uploading %s to Supabase Storage bucket=shop_assets filename=%s size=%d content_type=%s",
+                label, filename, len(image_bytes), content_type
+            )
             
-            # Upload to Supabase Storage
+            # Upload to Supabase Storage (blocking client - keep it off the event loop)
             try:
-                response = self.supabase_client.storage.from_('shop_assets').upload(
+                response = await asyncio.to_thread(
+                    self.supabase_client.storage.from_('shop_assets').upload,
                     path=filename,
                     file=image_bytes,
-                    file_options={"content-type": content_type, "upsert": "true"}
+                    file_options={"content-type": content_type, "cache-control": IMMUTABLE_CACHE_SECONDS, "upsert": "true"}
                 )
-                print(f"   Upload response: {response}")
-            except Exception as upload_error:
-                print(f"❌ Upload failed: {str(upload_error)}")
-                import traceback
-                traceback.print_exc()
+                logger.debug("Upload response: %s", response)
+            except Exception:
+                logger.exception("%s upload failed filename=%s", label.capitalize(), filename)
                 return None
             
             # Get public URL
@@ -268,32 +181,43 @@ class CustomizationService:
                 
                 if not public_url:
                     # Fallback: construct URL manually
-                    supabase_url = SUPABASE_URL.rstrip('/')
-                    if not supabase_url.endswith('/storage/v1'):
-                        supabase_url = f"{supabase_url}/storage/v1"
-                    public_url = f"{supabase_url}/object/public/shop_assets/{filename}"
-                    print(f"   Using fallback URL: {public_url}")
+                    public_url = self._public_shop_asset_url(filename)
+                    logger.debug("Using fallback URL: %s", public_url)
                 
-                print(f"✅ Cover image uploaded successfully: {public_url}")
+                logger.debug("%s uploaded: %s", label.capitalize(), public_url)
                 return public_url
-            except Exception as url_error:
-                print(f"❌ Failed to get public URL: {str(url_error)}")
-                import traceback
-                traceback.print_exc()
+            except Exception:
+                logger.exception("Failed to get public URL filename=%s", filename)
                 # Fallback: construct URL manually
-                supabase_url = SUPABASE_URL.rstrip('/')
-                if not supabase_url.endswith('/storage/v1'):
-                    supabase_url = f"{supabase_url}/storage/v1"
-                public_url = f"{supabase_url}/object/public/shop_assets/{filename}"
-                print(f"   Using fallback URL: {public_url}")
+                public_url = self._public_shop_asset_url(filename)
+                logger.debug("Using fallback URL: %s", public_url)
                 return public_url
             
-        except Exception as e:
-            print(f"❌ Failed to upload cover image: {str(e)}")
-            import traceback
-            traceback.print_exc()
+        except Exception:
+            logger.exception("Failed to upload %s", label)
             return None
     
+    def remove_previous_shop_assets(self, folder: str, restaurant_id: str, current_url: str) -> None:
+        """
+        ลบรูปเก่าของร้านใน shop_assets/<folder> หลังบันทึก URL ใหม่แล้ว (ชื่อไฟล์เป็น content hash จึงไม่ถูกเขียนทับ)
+        
+        Args:
+            folder: "logos" or "covers"
+            restaurant_id: Restaurant ID
+            current_url: Public URL of the image that is now saved on the restaurant
+        """
+        if not self.supabase_client or '/shop_assets/' not in current_url:
+            return
+        keep_path = current_url.split('/shop_assets/')[1].split('?')[0]
+        remove_superseded_objects(self.supabase_client, 'shop_assets', folder, f"{restaurant_id}_", keep_path)
+    
+    def _public_shop_asset_url(self, filename: str) -> str:
+        """Public URL of a shop_assets object built from SUPABASE_URL"""
+        supabase_url = SUPABASE_URL.rstrip('/')
+        if not supabase_url.endswith('/storage/v1'):
+            supabase_url = f"{supabase_url}/storage/v1"
+        return f"{supabase_url}/object/public/shop_assets/{filename}"
+    
     def delete_cover_image(self, image_url: str) -> bool:
         """
         Delete cover image from Supabase Storage
@@ -305,7 +229,7 @@ class CustomizationService:
             True if deleted successfully, False otherwise
         """
         if not self.supabase_client:
-            print("⚠️ Supabase client not available. Skipping delete.")
+            logger.warning("Supabase client not available. Skipping delete.")
             return False
         
         try:
@@ -314,21 +238,19 @@ class CustomizationService:
             if '/shop_assets/' in image_url:
                 filename = image_url.split('/shop_assets/')[1]
             else:
-                print(f"⚠️ Invalid image URL format: {image_url}")
+                logger.warning("Invalid image URL format: %s", image_url)
                 return False
             
-            print(f"🗑️ Deleting cover image: {filename}")
+            logger.debug("Deleting cover image: %s", filename)
             
             # Delete from Supabase Storage
             response = self.supabase_client.storage.from_('shop_assets').remove([filename])
             
-            print(f"✅ Cover image deleted successfully")
+            logger.info("Cover image deleted: %s", filename)
             return True
             
-        except Exception as e:
-            print(f"❌ Failed to delete cover image: {str(e)}")
-            import traceback
-            traceback.print_exc()
+        except Exception:
+            logger.exception("Failed to delete cover image")
             return False
 
 
@@ -0,0 +1,16 @@
+"""
+Identifier helpers shared by the services and API routes
+"""
+
+import re
+
+# Canonical 8-4-4-4-12 hex UUID (Supabase primary keys / auth user ids), compiled once
+UUID_PATTERN = re.compile(
+    r'^[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}$',
+    re.IGNORECASE
+)
+
+
+def is_uuid(value: str) -> bool:
+    """ตรวจสอบว่า string เป็น UUID format หรือไม่"""
+    return bool(UUID_PATTERN.match(value))
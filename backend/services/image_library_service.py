@@ -5,10 +5,12 @@ import os
 from typing import Optional, Dict, Any, List
 from dotenv import load_dotenv
 import pathlib
-from datetime import datetime
+import traceback
+from datetime import datetime, timedelta
 
 try:
-    from supabase import create_client, Client
+    from supabase import Client
+    from .supabase_client import get_supabase_client
     SUPABASE_AVAILABLE = True
 except ImportError:
     SUPABASE_AVAILABLE = False
@@ -31,7 +33,7 @@ class ImageLibraryService:
         self.supabase_client: Optional[Client] = None
         if SUPABASE_AVAILABLE and SUPABASE_URL and SUPABASE_KEY:
             try:
-                self.supabase_client = create_client(SUPABASE_URL, SUPABASE_KEY)
+                self.supabase_client = get_supabase_client(SUPABASE_URL, SUPABASE_KEY)
                 print("✅ Image Library Service: Supabase client initialized")
             except Exception as e:
                 print(f"⚠️ Image Library Service: Failed to initialize: {str(e)}")
@@ -97,7 +99,6 @@ class ImageLibraryService:
             
         except Exception as e:
             print(f"❌ Failed to get user images: {str(e)}")
-            import traceback
             traceback.print_exc()
             return []
     
@@ -157,7 +158,6 @@ class ImageLibraryService:
             
         except Exception as e:
             print(f"❌ Failed to get restaurant images: {str(e)}")
-            import traceback
             traceback.print_exc()
             return []
     
@@ -244,7 +244,6 @@ class ImageLibraryService:
         
         try:
             # Calculate cutoff date
-            from datetime import datetime, timedelta
             cutoff_date = (datetime.now() - timedelta(days=days)).isoformat()
             
             # ดึงร้านทั้งหมดของ user
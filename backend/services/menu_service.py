@@ -3,11 +3,24 @@ Menu Service - จัดการเมนูอาหารใน Supabase Data
 """
 
 import os
-from typing import List, Dict, Any, Optional
-from supabase import create_client, Client
+import copy
+import hashlib
+from typing import List, Dict, Any, Optional, Tuple
+import httpx
+import orjson
+from supabase import Client
 from dotenv import load_dotenv
 import pathlib
-import re
+import random
+import threading
+import time
+import json
+import traceback
+
+from .supabase_client import get_supabase_client
+from .translation_cache import compute_source_hash
+from .ttl_cache import TTLCache
+from .ids import is_uuid
 
 # Load environment variables
 env_path = pathlib.Path(__file__).parent.parent.parent / '.env'
@@ -30,6 +43,31 @@ if SUPABASE_SERVICE_KEY:
 else:
     print("⚠️ Menu Service: Using ANON_KEY (subject to RLS policies)")
 
+# Menu listings/stats are read on every customer page load but change rarely
+MENU_CACHE_TTL_SECONDS = 30
+
+# Transient network errors talking to Supabase are retried before giving up
+SUPABASE_RETRY_ATTEMPTS = 3
+
+
+def _execute_with_retry(query, attempts: int = SUPABASE_RETRY_ATTEMPTS):
+    """query.execute() with exponential backoff + jitter on transport (network) errors"""
+    for attempt in range(attempts):
+        try:
+            return query.execute()
+        except httpx.TransportError:
+            if attempt == attempts - 1:
+                raise
+            time.sleep(min(1.0, 0.1 * 2 ** attempt) * random.uniform(0.5, 1.0))
+
+def compute_body_etag(body: bytes) -> str:
+    """Weak ETag for an already encoded response body"""
+    return f'W/"{hashlib.blake2b(body, digest_size=16).hexdigest()}"'
+
+def compute_payload_etag(payload: Any) -> str:
+    """Weak ETag for a JSON-serializable payload (hash of its orjson encoding)"""
+    return compute_body_etag(orjson.dumps(payload))
+
 class MenuService:
     """Service for managing menu items in Supabase"""
     
@@ -37,21 +75,50 @@ class MenuService:
         self.supabase_client: Optional[Client] = None
         if SUPABASE_URL and SUPABASE_KEY:
             try:
-                self.supabase_client = create_client(SUPABASE_URL, SUPABASE_KEY)
+                self.supabase_client = get_supabase_client(SUPABASE_URL, SUPABASE_KEY)
                 print("✅ Menu Service: Supabase client initialized")
             except Exception as e:
                 print(f"⚠️ Menu Service: Failed to initialize Supabase client: {str(e)}")
                 self.supabase_client = None
         else:
             print("⚠️ Menu Service: Supabase credentials not found")
+
+        # ("items" | "stats", restaurant_id) -> cached result (items are stored with their ETag)
+        self._cache = TTLCache(1024, MENU_CACHE_TTL_SECONDS)
+        # Per-key load locks so concurrent misses hit Supabase once
+        self._load_locks: Dict[Any, threading.Lock] = {}
+        self._load_locks_guard = threading.Lock()
+
+    def _cached(self, key, loader):
+        """Return cached value for key, or load it once (concurrent misses wait for the first)"""
+        value = self._cache.get(key)
+        if value is not None:
+            return value
+        with self._load_locks_guard:
+            lock = self._load_locks.setdefault(key, threading.Lock())
+        try:
+            with lock:
+                value = self._cache.get(key)
+                if value is None:
+                    value = loader()
+                    self._cache.set(key, value)
+        finally:
+            # Waiters already hold a reference to the lock; drop the entry so the dict stays bounded
+            with self._load_locks_guard:
+                if self._load_locks.get(key) is lock:
+                    del self._load_locks[key]
+        return value
+
+    def invalidate_restaurant(self, restaurant_id: Optional[str]) -> None:
+        """Drop cached menu items/stats for a restaurant (call after any menu write)"""
+        if not restaurant_id:
+            return
+        self._cache.delete(("items", restaurant_id))
+        self._cache.delete(("stats", restaurant_id))
     
     def _is_valid_uuid(self, uuid_string: str) -> bool:
         """ตรวจสอบว่า string เป็น UUID format หรือไม่"""
-        uuid_pattern = re.compile(
-            r'^[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}$',
-            re.IGNORECASE
-        )
-        return bool(uuid_pattern.match(uuid_string))
+        return is_uuid(uuid_string)
     
     def create_menu_item(self, restaurant_id: str, menu_data: Dict[str, Any]) -> Optional[Dict[str, Any]]:
         """
@@ -99,7 +166,6 @@ class MenuService:
                 db_data["menu_type"] = menu_data.get("menu_type", "food")
 
             # Store meats and addOns in options JSONB column
-            import json
             options_data = {}
             if menu_data.get("meats"):
                 options_data["meats"] = menu_data.get("meats")
@@ -138,6 +204,7 @@ class MenuService:
             
             if result.data and len(result.data) > 0:
                 menu_item = result.data[0]
+                self.invalidate_restaurant(restaurant_id)
                 print(f"✅ Menu Service: Created menu item with ID: {menu_item.get('id')}")
                 return self._format_menu_item(menu_item)
             else:
@@ -146,7 +213,6 @@ class MenuService:
         except Exception as e:
             print(f"❌ Menu Service: Failed to create menu item: {str(e)}")
             print(f"   Data attempted: {db_data}")
-            import traceback
             traceback.print_exc()
             raise Exception(f"Database error: {str(e)}")
     
@@ -160,25 +226,80 @@ class MenuService:
         Returns:
             List of menu items
         """
+        return self.get_menu_items_with_etag(restaurant_id)[0]
+
+    def get_menu_items_with_etag(self, restaurant_id: str) -> Tuple[List[Dict[str, Any]], str]:
+        """
+        ดึง menu items พร้อม ETag (hash ของ items, cache ไว้คู่กันจึงไม่ต้อง hash ซ้ำทุก request)
+
+        Args:
+            restaurant_id: Restaurant ID
+
+        Returns:
+            (list of menu items, weak ETag)
+        """
         if not self.supabase_client:
-            return []
+            return [], compute_payload_etag([])
         
         if not self._is_valid_uuid(restaurant_id):
             print(f"⚠️ Menu Service: Invalid restaurant_id format '{restaurant_id}'")
-            return []
+            return [], compute_payload_etag([])
         
-        try:
+        def load():
             result = self.supabase_client.table('menus').select('*').eq('restaurant_id', restaurant_id).eq('is_active', True).order('sort_order', desc=False).execute()
-            
-            if result.data:
-                return [self._format_menu_item(item) for item in result.data]
-            return []
+            items = [self._format_menu_item(item) for item in (result.data or [])]
+            return items, compute_payload_etag(items)
+
+        try:
+            items, etag = self._cached(("items", restaurant_id), load)
+            # Deep copy: callers may mutate the list or the item dicts without touching the cache
+            return copy.deepcopy(items), etag
         except Exception as e:
             print(f"❌ Menu Service: Failed to get menu items: {str(e)}")
-            import traceback
             traceback.print_exc()
-            return []
+            return [], compute_payload_etag([])
     
+    def get_menu_stats(self, restaurant_id: str) -> Dict[str, int]:
+        """
+        สถิติเมนูของร้าน (นับใน database ไม่ต้องดึงทุกแถว)
+
+        Uses the get_menu_stats RPC (supabase/migrations/add_get_menu_stats_function.sql);
+        falls back to fetching only category/image_url if the function is missing.
+
+        Args:
+            restaurant_id: Restaurant ID
+
+        Returns:
+            Dictionary with total_items, categories, with_images
+        """
+        stats = {"total_items": 0, "categories": 0, "with_images": 0}
+        if not self.supabase_client or not self._is_valid_uuid(restaurant_id):
+            return stats
+
+        def load():
+            try:
+                result = self.supabase_client.rpc('get_menu_stats', {'p_restaurant_id': restaurant_id}).execute()
+                if result.data:
+                    row = result.data[0]
+                    return {key: int(row.get(key) or 0) for key in stats}
+                return dict(stats)
+            except Exception as e:
+                print(f"⚠️ Menu Service: get_menu_stats RPC failed, counting client-side: {str(e)}")
+
+            result = self.supabase_client.table('menus').select('category,image_url').eq('restaurant_id', restaurant_id).eq('is_active', True).execute()
+            rows = result.data or []
+            return {
+                "total_items": len(rows),
+                "categories": len({row['category'] for row in rows if row.get('category')}),
+                "with_images": sum(1 for row in rows if row.get('image_url')),
+            }
+
+        try:
+            return dict(self._cached(("stats", restaurant_id), load))
+        except Exception as e:
+            print(f"❌ Menu Service: Failed to get menu stats: {str(e)}")
+            return stats
+
     def get_menu_item(self, menu_id: str) -> Optional[Dict[str, Any]]:
         """
         ดึง menu item เดียว
@@ -196,11 +317,14 @@ class MenuService:
             return None
         
         try:
-            result = self.supabase_client.table('menus').select('*').eq('id', menu_id).limit(1).execute()
+            result = _execute_with_retry(self.supabase_client.table('menus').select('*').eq('id', menu_id).limit(1))
             
             if result.data and len(result.data) > 0:
                 return self._format_menu_item(result.data[0])
             return None
+        except httpx.TransportError:
+            # Not a "not found" - let the caller report the outage
+            raise
         except Exception as e:
             print(f"❌ Menu Service: Failed to get menu item: {str(e)}")
             return None
@@ -259,15 +383,18 @@ class MenuService:
                 return None
 
             print(f"📝 Menu Service: Update data = {update_data}")
-            result = self.supabase_client.table('menus').update(update_data).eq('id', menu_id).execute()
+            result = _execute_with_retry(self.supabase_client.table('menus').update(update_data).eq('id', menu_id))
             print(f"📝 Menu Service: Update result = {result.data}")
             
             if result.data and len(result.data) > 0:
+                self.invalidate_restaurant(result.data[0].get('restaurant_id'))
                 return self._format_menu_item(result.data[0])
             return None
+        except httpx.TransportError:
+            # Not a "not found" - let the caller report the outage
+            raise
         except Exception as e:
             print(f"❌ Menu Service: Failed to update menu item: {str(e)}")
-            import traceback
             traceback.print_exc()
             return None
     
@@ -302,6 +429,8 @@ class MenuService:
         
         try:
             result = self.supabase_client.table('menus').update({"is_active": False}).eq('id', menu_id).execute()
+            if result.data:
+                self.invalidate_restaurant(result.data[0].get('restaurant_id'))
             return result.data is not None and len(result.data) > 0
         except Exception as e:
             print(f"❌ Menu Service: Failed to delete menu item: {str(e)}")
@@ -322,7 +451,6 @@ class MenuService:
         category_english = db_item.get("category_english") or category
         
         # Parse options JSON if available
-        import json
         options = db_item.get("options", {})
         if isinstance(options, str):
             try:
@@ -333,7 +461,7 @@ class MenuService:
         meats = options.get("meats", []) if options else []
         addOns = options.get("addOns", []) if options else []
         
-        return {
+        formatted = {
             "menu_id": db_item.get("id"),
             "name": db_item.get("name_original", ""),
             "nameEn": db_item.get("name_english", ""),
@@ -354,6 +482,9 @@ class MenuService:
             "updated_at": db_item.get("updated_at"),
             "restaurant_id": db_item.get("restaurant_id"),
         }
+        # Server-side hash of translatable text (translation cache invalidation)
+        formatted["source_hash"] = compute_source_hash(formatted)
+        return formatted
 
 # Create singleton instance
 menu_service = MenuService()
@@ -73,7 +73,7 @@ class MenuStorage:
     def get_stats(self, restaurant_id: str = "default") -> Dict[str, Any]:
         """สถิติของร้าน"""
         items = self.menu_items.get(restaurant_id, [])
-        categories = set(item.get("category") for item in items if item.get("category"))
+        categories = {category for item in items if (category := item.get("category"))}
         
         return {
             "total_items": len(items),
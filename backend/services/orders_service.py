@@ -9,13 +9,18 @@ GST Calculation for New Zealand:
 
 import os
 from typing import List, Dict, Any, Optional
-from supabase import create_client, Client
+from supabase import Client
+
+from .supabase_client import get_supabase_client
+from .ids import is_uuid
 from dotenv import load_dotenv
 import pathlib
-import re
+import logging
 from datetime import datetime
 from decimal import Decimal, ROUND_HALF_UP
 
+logger = logging.getLogger(__name__)
+
 # Load environment variables
 env_path = pathlib.Path(__file__).parent.parent.parent / '.env'
 if env_path.exists():
@@ -37,7 +42,7 @@ class OrdersService:
         self.supabase_client: Optional[Client] = None
         if SUPABASE_URL and SUPABASE_KEY:
             try:
-                self.supabase_client = create_client(SUPABASE_URL, SUPABASE_KEY)
+                self.supabase_client = get_supabase_client(SUPABASE_URL, SUPABASE_KEY)
                 print("✅ Orders Service: Supabase client initialized")
             except Exception as e:
                 print(f"⚠️ Orders Service: Failed to initialize Supabase client: {str(e)}")
@@ -47,24 +52,27 @@ class OrdersService:
     
     def _is_valid_uuid(self, uuid_string: str) -> bool:
         """ตรวจสอบว่า string เป็น UUID format หรือไม่"""
-        uuid_pattern = re.compile(
-            r'^[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}$',
-            re.IGNORECASE
-        )
-        return bool(uuid_pattern.match(uuid_string))
+        return is_uuid(uuid_string)
 
-    def _get_restaurant_gst_settings(self, restaurant_id: str) -> Dict[str, Any]:
+    def _get_restaurant_gst_settings(self, restaurant_id: str, restaurant: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
         """
         Get GST settings for a restaurant
 
         Args:
             restaurant_id: Restaurant ID
+            restaurant: Already fetched restaurants row (optional - skips the query)
 
         Returns:
             Dictionary with gst_registered (bool) and gst_number (str or None)
         """
         default_settings = {"gst_registered": True, "gst_number": None}
 
+        if restaurant is not None:
+            return {
+                "gst_registered": restaurant.get("gst_registered", True),
+                "gst_number": restaurant.get("gst_number")
+            }
+
         if not self.supabase_client or not self._is_valid_uuid(restaurant_id):
             return default_settings
 
@@ -74,27 +82,31 @@ class OrdersService:
             ).eq('id', restaurant_id).limit(1).execute()
 
             if result.data and len(result.data) > 0:
-                return {
-                    "gst_registered": result.data[0].get("gst_registered", True),
-                    "gst_number": result.data[0].get("gst_number")
-                }
+                return self._get_restaurant_gst_settings(restaurant_id, result.data[0])
             return default_settings
         except Exception as e:
-            print(f"⚠️ Orders Service: Failed to get GST settings: {str(e)}")
+            logger.warning("Failed to get GST settings: %s", e)
             return default_settings
 
-    def _get_restaurant_surcharge_settings(self, restaurant_id: str) -> Dict[str, Any]:
+    def _get_restaurant_surcharge_settings(self, restaurant_id: str, restaurant: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
         """
         Get credit card surcharge settings for a restaurant
 
         Args:
             restaurant_id: Restaurant ID
+            restaurant: Already fetched restaurants row (optional - skips the query)
 
         Returns:
             Dictionary with credit_card_surcharge_enabled (bool) and credit_card_surcharge_rate (float)
         """
         default_settings = {"credit_card_surcharge_enabled": False, "credit_card_surcharge_rate": 2.50}
 
+        if restaurant is not None:
+            return {
+                "credit_card_surcharge_enabled": restaurant.get("credit_card_surcharge_enabled", False),
+                "credit_card_surcharge_rate": float(restaurant.get("credit_card_surcharge_rate", 2.50) or 2.50)
+            }
+
         if not self.supabase_client or not self._is_valid_uuid(restaurant_id):
             return default_settings
 
@@ -104,13 +116,10 @@ class OrdersService:
             ).eq('id', restaurant_id).limit(1).execute()
 
             if result.data and len(result.data) > 0:
-                return {
-                    "credit_card_surcharge_enabled": result.data[0].get("credit_card_surcharge_enabled", False),
-                    "credit_card_surcharge_rate": float(result.data[0].get("credit_card_surcharge_rate", 2.50) or 2.50)
-                }
+                return self._get_restaurant_surcharge_settings(restaurant_id, result.data[0])
             return default_settings
         except Exception as e:
-            print(f"⚠️ Orders Service: Failed to get surcharge settings: {str(e)}")
+            logger.warning("Failed to get surcharge settings: %s", e)
             return default_settings
 
     def calculate_surcharge(self, subtotal: float, surcharge_rate: float) -> float:
@@ -159,23 +168,25 @@ class OrdersService:
         # Round to 2 decimal places using banker's rounding
         return float(gst.quantize(Decimal('0.01'), rounding=ROUND_HALF_UP))
     
-    def create_order(self, restaurant_id: str, order_data: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    def create_order(self, restaurant_id: str, order_data: Dict[str, Any], restaurant: Optional[Dict[str, Any]] = None) -> Optional[Dict[str, Any]]:
         """
         สร้างออเดอร์ใหม่
         
         Args:
             restaurant_id: Restaurant ID
             order_data: Dictionary with order data (items, table_no, etc.)
+            restaurant: Already fetched restaurants row (optional) - GST/surcharge settings
+                are read from it instead of querying restaurants again
             
         Returns:
             Dictionary with created order or None if failed
         """
         if not self.supabase_client:
-            print("⚠️ Orders Service: Supabase client not available")
+            logger.warning("Supabase client not available")
             return None
         
         if not self._is_valid_uuid(restaurant_id):
-            print(f"⚠️ Orders Service: Invalid restaurant_id format '{restaurant_id}'")
+            logger.warning("Invalid restaurant_id format '%s'", restaurant_id)
             return None
         
         try:
@@ -183,7 +194,7 @@ class OrdersService:
             service_type = order_data.get("service_type", "dine_in")
             valid_service_types = ["dine_in", "pickup", "delivery"]
             if service_type not in valid_service_types:
-                print(f"⚠️ Orders Service: Invalid service_type '{service_type}'. Must be one of: {valid_service_types}")
+                logger.warning("Invalid service_type '%s'. Must be one of: %s", service_type, valid_service_types)
                 service_type = "dine_in"  # Default fallback
             
             # Validate customer_details based on service_type
@@ -196,24 +207,24 @@ class OrdersService:
                 if "table_no" not in customer_details and order_data.get("table_no"):
                     customer_details["table_no"] = order_data.get("table_no")
                 if not customer_details.get("table_no"):
-                    print("⚠️ Orders Service: dine_in requires table_no in customer_details")
+                    logger.warning("dine_in requires table_no in customer_details")
                     customer_details["table_no"] = order_data.get("table_no") or "0"
             
             elif service_type == "pickup":
                 if not customer_details.get("name"):
-                    print("⚠️ Orders Service: pickup requires name in customer_details")
+                    logger.warning("pickup requires name in customer_details")
                     customer_details["name"] = order_data.get("customer_name") or "Guest"
                 if not customer_details.get("pickup_time"):
-                    print("⚠️ Orders Service: pickup requires pickup_time in customer_details")
+                    logger.warning("pickup requires pickup_time in customer_details")
                     # Set default pickup time if not provided
                     customer_details["pickup_time"] = customer_details.get("pickup_time") or datetime.now().isoformat()
             
             elif service_type == "delivery":
                 if not customer_details.get("name"):
-                    print("⚠️ Orders Service: delivery requires name in customer_details")
+                    logger.warning("delivery requires name in customer_details")
                     customer_details["name"] = order_data.get("customer_name") or "Guest"
                 if not customer_details.get("address"):
-                    print("⚠️ Orders Service: delivery requires address in customer_details")
+                    logger.warning("delivery requires address in customer_details")
                     customer_details["address"] = customer_details.get("address") or ""
                 if not customer_details.get("phone"):
                     customer_details["phone"] = order_data.get("customer_phone") or ""
@@ -231,7 +242,7 @@ class OrdersService:
             if order_data.get("surcharge_amount") is not None:
                 surcharge_amount = float(order_data.get("surcharge_amount", 0))
             elif payment_method == "card":
-                surcharge_settings = self._get_restaurant_surcharge_settings(restaurant_id)
+                surcharge_settings = self._get_restaurant_surcharge_settings(restaurant_id, restaurant)
                 if surcharge_settings.get("credit_card_surcharge_enabled", False):
                     surcharge_rate = surcharge_settings.get("credit_card_surcharge_rate", 2.50)
                     surcharge_amount = self.calculate_surcharge(subtotal + delivery_fee, surcharge_rate)
@@ -240,7 +251,7 @@ class OrdersService:
             total_price = subtotal + delivery_fee + surcharge_amount
 
             # Get GST settings and calculate GST (extracted from inclusive price)
-            gst_settings = self._get_restaurant_gst_settings(restaurant_id)
+            gst_settings = self._get_restaurant_gst_settings(restaurant_id, restaurant)
             tax = self.calculate_gst(total_price, gst_settings.get("gst_registered", True))
 
             db_data = {
@@ -266,22 +277,28 @@ class OrdersService:
             
             if result.data and len(result.data) > 0:
                 order = result.data[0]
-                print(f"✅ Orders Service: Created order {order.get('id')} for restaurant {restaurant_id}")
+                logger.info("Created order %s for restaurant %s", order.get('id'), restaurant_id)
                 return order
             return None
-        except Exception as e:
-            print(f"❌ Orders Service: Failed to create order: {str(e)}")
-            import traceback
-            traceback.print_exc()
+        except Exception:
+            logger.exception("Failed to create order")
             return None
     
-    def get_orders(self, restaurant_id: str, status: Optional[str] = None) -> List[Dict[str, Any]]:
+    def get_orders(
+        self,
+        restaurant_id: str,
+        status: Optional[str] = None,
+        limit: Optional[int] = None,
+        offset: int = 0
+    ) -> List[Dict[str, Any]]:
         """
-        ดึงออเดอร์ทั้งหมดของร้าน
+        ดึงออเดอร์ทั้งหมดของร้าน (ใหม่สุดก่อน)
         
         Args:
             restaurant_id: Restaurant ID
             status: Filter by status (optional)
+            limit: Page size (optional, None = all)
+            offset: Number of orders to skip (only with limit)
             
         Returns:
             List of orders
@@ -298,23 +315,28 @@ class OrdersService:
             if status:
                 query = query.eq('status', status)
             
-            result = query.order('created_at', desc=True).execute()
+            query = query.order('created_at', desc=True)
+            if limit:
+                # Paged in the database - only this page crosses the wire
+                query = query.range(offset, offset + limit - 1)
+            
+            result = query.execute()
             
             if result.data:
                 return result.data
             return []
-        except Exception as e:
-            print(f"❌ Orders Service: Failed to get orders: {str(e)}")
-            import traceback
-            traceback.print_exc()
+        except Exception:
+            logger.exception("Failed to get orders")
             return []
     
-    def get_order(self, order_id: str) -> Optional[Dict[str, Any]]:
+    def get_order(self, order_id: str, raise_errors: bool = False) -> Optional[Dict[str, Any]]:
         """
         ดึงออเดอร์เดียว
         
         Args:
             order_id: Order ID
+            raise_errors: Re-raise Supabase errors instead of returning None, so callers can
+                tell "order not found" from "database unavailable"
             
         Returns:
             Dictionary with order or None if not found
@@ -332,7 +354,47 @@ class OrdersService:
                 return result.data[0]
             return None
         except Exception as e:
-            print(f"❌ Orders Service: Failed to get order: {str(e)}")
+            logger.error("Failed to get order: %s", e)
+            if raise_errors:
+                raise
+            return None
+    
+    def update_order(
+        self,
+        order_id: str,
+        data: Dict[str, Any],
+        unless_payment_status: Optional[str] = None
+    ) -> Optional[Dict[str, Any]]:
+        """
+        อัปเดต field ของออเดอร์ (payment info, slip URL ฯลฯ)
+        
+        Args:
+            order_id: Order ID
+            data: Columns to update
+            unless_payment_status: Skip the update if the order already has this payment_status
+                (e.g. 'paid', so a late write cannot undo a confirmed payment)
+            
+        Returns:
+            Dictionary with updated order or None if failed / nothing matched
+        """
+        if not self.supabase_client:
+            return None
+        
+        if not self._is_valid_uuid(order_id):
+            return None
+        
+        try:
+            query = self.supabase_client.table('orders').update(data).eq('id', order_id)
+            if unless_payment_status:
+                # NULL <> 'paid' is NULL in SQL, so match unset statuses explicitly
+                query = query.or_(f"payment_status.is.null,payment_status.neq.{unless_payment_status}")
+            result = query.execute()
+            
+            if result.data and len(result.data) > 0:
+                return result.data[0]
+            return None
+        except Exception:
+            logger.exception("Failed to update order %s", order_id)
             return None
     
     def update_order_status(self, order_id: str, status: str) -> Optional[Dict[str, Any]]:
@@ -354,7 +416,7 @@ class OrdersService:
         
         valid_statuses = ['pending', 'preparing', 'ready', 'completed', 'cancelled']
         if status not in valid_statuses:
-            print(f"⚠️ Orders Service: Invalid status '{status}'")
+            logger.warning("Invalid status '%s'", status)
             return None
         
         try:
@@ -364,13 +426,11 @@ class OrdersService:
             
             if result.data and len(result.data) > 0:
                 order = result.data[0]
-                print(f"✅ Orders Service: Updated order {order_id} status to {status}")
+                logger.info("Updated order %s status to %s", order_id, status)
                 return order
             return None
-        except Exception as e:
-            print(f"❌ Orders Service: Failed to update order status: {str(e)}")
-            import traceback
-            traceback.print_exc()
+        except Exception:
+            logger.exception("Failed to update order status")
             return None
 
     def get_orders_summary(
@@ -470,10 +530,8 @@ class OrdersService:
                 "summary": summary
             }
 
-        except Exception as e:
-            print(f"❌ Orders Service: Failed to get orders summary: {str(e)}")
-            import traceback
-            traceback.print_exc()
+        except Exception:
+            logger.exception("Failed to get orders summary")
             return {"orders": [], "summary": {}}
 
 
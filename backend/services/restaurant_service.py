@@ -3,18 +3,26 @@ Restaurant Service - จัดการข้อมูลร้านอาห
 """
 import os
 import re
+import asyncio
 from typing import Optional, Dict, Any
 from dotenv import load_dotenv
 import pathlib
+import logging
 
 # Supabase for database
 try:
-    from supabase import create_client, Client
+    from supabase import Client
+    from .supabase_client import get_supabase_client
     SUPABASE_AVAILABLE = True
 except ImportError:
     SUPABASE_AVAILABLE = False
     print("⚠️ Supabase library not available. Install with: pip install supabase")
 
+from .ttl_cache import TTLCache
+from .ids import is_uuid
+
+logger = logging.getLogger(__name__)
+
 # Load environment variables
 env_path = pathlib.Path(__file__).parent.parent.parent / '.env'
 if env_path.exists():
@@ -30,14 +38,27 @@ SUPABASE_KEY = (
 )
 
 
+# Customer menu page reloads hit the same restaurant constantly; owner edits clear the cache
+PUBLIC_RESTAURANT_CACHE_TTL_SECONDS = 30
+
+# Restaurant rows by identifier for orders/service requests/best sellers; every write through
+# the backend clears it, the TTL only bounds staleness across worker processes
+RESTAURANT_CACHE_TTL_SECONDS = 60
+
 class RestaurantService:
     """Service for managing restaurant data in Supabase"""
     
     def __init__(self):
+        # identifier (UUID or slug) → restaurant UUID, 5 minutes
+        self._id_cache = TTLCache(maxsize=1024, ttl=300)
+        # identifier (UUID or slug) → public menu restaurant row + owner_role, cleared on writes
+        self._public_cache = TTLCache(maxsize=4096, ttl=PUBLIC_RESTAURANT_CACHE_TTL_SECONDS)
+        # identifier (UUID or slug) → restaurants row, cleared on writes
+        self._restaurant_cache = TTLCache(maxsize=1024, ttl=RESTAURANT_CACHE_TTL_SECONDS)
         self.supabase_client: Optional[Client] = None
         if SUPABASE_AVAILABLE and SUPABASE_URL and SUPABASE_KEY:
             try:
-                self.supabase_client = create_client(SUPABASE_URL, SUPABASE_KEY)
+                self.supabase_client = get_supabase_client(SUPABASE_URL, SUPABASE_KEY)
                 print("✅ Restaurant Service: Supabase client initialized")
             except Exception as e:
                 print(f"⚠️ Restaurant Service: Failed to initialize Supabase client: {str(e)}")
@@ -49,11 +70,7 @@ class RestaurantService:
     
     def _is_valid_uuid(self, uuid_string: str) -> bool:
         """ตรวจสอบว่า string เป็น UUID format หรือไม่"""
-        uuid_pattern = re.compile(
-            r'^[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}$',
-            re.IGNORECASE
-        )
-        return bool(uuid_pattern.match(uuid_string))
+        return is_uuid(uuid_string)
     
     def _slugify(self, text: str) -> str:
         """
@@ -86,12 +103,12 @@ class RestaurantService:
             Dictionary with restaurant data or None if not found
         """
         if not self.supabase_client:
-            print("⚠️ Restaurant Service: Supabase client not available")
+            logger.warning("Supabase client not available")
             return None
         
         # Validate UUID format
         if not self._is_valid_uuid(user_id):
-            print(f"⚠️ Restaurant Service: Invalid UUID format for user_id: {user_id}")
+            logger.warning("Invalid UUID format for user_id: %s", user_id)
             return None
         
         try:
@@ -100,16 +117,14 @@ class RestaurantService:
             
             if result.data and len(result.data) > 0:
                 restaurant = result.data[0]
-                print(f"✅ Restaurant Service: Found restaurant for user {user_id}")
+                logger.debug("Found restaurant for user %s", user_id)
                 return restaurant
             else:
-                print(f"⚠️ Restaurant Service: No restaurant found for user {user_id}")
+                logger.info("No restaurant found for user %s", user_id)
                 return None
                 
-        except Exception as e:
-            print(f"❌ Restaurant Service: Failed to get restaurant: {str(e)}")
-            import traceback
-            traceback.print_exc()
+        except Exception:
+            logger.exception("Failed to get restaurant")
             return None
     
     def get_all_restaurants_by_user_id(self, user_id: str) -> list:
@@ -123,12 +138,12 @@ class RestaurantService:
             List of restaurants owned by user
         """
         if not self.supabase_client:
-            print("⚠️ Restaurant Service: Supabase client not available")
+            logger.warning("Supabase client not available")
             return []
         
         # Validate UUID format
         if not self._is_valid_uuid(user_id):
-            print(f"⚠️ Restaurant Service: Invalid UUID format for user_id: {user_id}")
+            logger.warning("Invalid UUID format for user_id: %s", user_id)
             return []
         
         try:
@@ -136,16 +151,14 @@ class RestaurantService:
             result = self.supabase_client.table('restaurants').select('*').eq('user_id', user_id).execute()
             
             if result.data:
-                print(f"✅ Restaurant Service: Found {len(result.data)} restaurant(s) for user {user_id}")
+                logger.debug("Found %s restaurant(s) for user %s", len(result.data), user_id)
                 return result.data
             else:
-                print(f"⚠️ Restaurant Service: No restaurants found for user {user_id}")
+                logger.info("No restaurants found for user %s", user_id)
                 return []
                 
-        except Exception as e:
-            print(f"❌ Restaurant Service: Failed to get restaurants: {str(e)}")
-            import traceback
-            traceback.print_exc()
+        except Exception:
+            logger.exception("Failed to get restaurants")
             return []
     
     def get_restaurant_by_id(self, restaurant_id: str) -> Optional[Dict[str, Any]]:
@@ -159,7 +172,7 @@ class RestaurantService:
             Dictionary with restaurant data or None if not found
         """
         if not self.supabase_client:
-            print("⚠️ Restaurant Service: Supabase client not available")
+            logger.warning("Supabase client not available")
             return None
         
         try:
@@ -167,16 +180,45 @@ class RestaurantService:
             
             if result.data and len(result.data) > 0:
                 restaurant = result.data[0]
-                print(f"✅ Restaurant Service: Found restaurant {restaurant_id}")
+                logger.debug("Found restaurant %s", restaurant_id)
                 return restaurant
             else:
-                print(f"⚠️ Restaurant Service: No restaurant found with ID {restaurant_id}")
+                logger.info("No restaurant found with ID %s", restaurant_id)
                 return None
                 
-        except Exception as e:
-            print(f"❌ Restaurant Service: Failed to get restaurant: {str(e)}")
-            import traceback
-            traceback.print_exc()
+        except Exception:
+            logger.exception("Failed to get restaurant")
+            return None
+    
+    def get_restaurant_by_id_or_user(self, restaurant_id: str, user_id: str) -> Optional[Dict[str, Any]]:
+        """
+        ดึงร้านจาก restaurant_id ถ้าไม่เจอใช้ร้านแรกของ user (query เดียวแทน 2 query)
+
+        Args:
+            restaurant_id: Restaurant ID (may be invalid / not exist)
+            user_id: User ID
+
+        Returns:
+            Dictionary with restaurant data or None if neither matches
+        """
+        if not self.supabase_client:
+            logger.warning("Supabase client not available")
+            return None
+
+        # Only UUIDs go into the or() filter string
+        filters = [f"{column}.eq.{value}" for column, value in (('id', restaurant_id), ('user_id', user_id)) if self._is_valid_uuid(value)]
+        if not filters:
+            return None
+
+        try:
+            # Matches the restaurant itself plus the user's restaurants (a handful at most)
+            result = self.supabase_client.table('restaurants').select('*').or_(','.join(filters)).execute()
+            rows = result.data or []
+            return next((row for row in rows if row.get('id') == restaurant_id.lower()), None) or next(
+                (row for row in rows if row.get('user_id') == user_id.lower()), None
+            )
+        except Exception:
+            logger.exception("Failed to get restaurant")
             return None
     
     def get_restaurant_by_slug(self, slug: str) -> Optional[Dict[str, Any]]:
@@ -190,23 +232,21 @@ class RestaurantService:
             Dictionary with restaurant data or None if not found
         """
         if not self.supabase_client:
-            print("⚠️ Restaurant Service: Supabase client not available")
+            logger.warning("Supabase client not available")
             return None
         
         try:
             result = self.supabase_client.table('restaurants').select('*').eq('slug', slug).limit(1).execute()
             
             if result.data and len(result.data) > 0:
-                print(f"✅ Restaurant Service: Found restaurant by slug '{slug}'")
+                logger.debug("Found restaurant by slug '%s'", slug)
                 return result.data[0]
             else:
-                print(f"⚠️ Restaurant Service: Restaurant not found by slug '{slug}'")
+                logger.info("Restaurant not found by slug '%s'", slug)
                 return None
                 
-        except Exception as e:
-            print(f"❌ Restaurant Service: Failed to get restaurant by slug: {str(e)}")
-            import traceback
-            traceback.print_exc()
+        except Exception:
+            logger.exception("Failed to get restaurant by slug")
             return None
     
     def get_restaurant_by_id_or_slug(self, identifier: str) -> Optional[Dict[str, Any]]:
@@ -217,14 +257,104 @@ class RestaurantService:
             identifier: Restaurant ID (UUID) หรือ slug
             
         Returns:
-            Dictionary with restaurant data or None if not found
+            Dictionary with restaurant data or None if not found. Cached for
+            RESTAURANT_CACHE_TTL_SECONDS and shared between callers - do not mutate.
         """
+        restaurant = self._restaurant_cache.get(identifier)
+        if restaurant is not None:
+            return restaurant
+
         # Try UUID first
         if self._is_valid_uuid(identifier):
-            return self.get_restaurant_by_id(identifier)
+            restaurant = self.get_restaurant_by_id(identifier)
         else:
             # Try slug
-            return self.get_restaurant_by_slug(identifier)
+            restaurant = self.get_restaurant_by_slug(identifier)
+
+        self._restaurant_cache.set(identifier, restaurant)
+        return restaurant
+
+    def invalidate_cache(self, slug_changed: bool = False) -> None:
+        """
+        ล้าง cache ข้อมูลร้าน - call after writing to restaurants outside this service
+
+        Args:
+            slug_changed: Also drop cached slug → id mappings
+        """
+        if slug_changed:
+            self._id_cache.clear()
+        self._restaurant_cache.clear()
+        self._public_cache.clear()
+
+    def get_public_restaurant(self, identifier: str) -> Optional[Dict[str, Any]]:
+        """
+        ดึงร้านอาหาร (ID หรือ slug) พร้อม role ของเจ้าของร้านใน query เดียว
+
+        Uses the get_public_restaurant() SQL function
+        (supabase/migrations/add_get_public_restaurant_function.sql); falls back to
+        get_restaurant_by_id_or_slug (without owner_role) if the function is missing.
+
+        Args:
+            identifier: Restaurant ID (UUID) หรือ slug
+
+        Returns:
+            Restaurant dictionary with an extra "owner_role" key (None when unknown),
+            or None if not found. Cached for PUBLIC_RESTAURANT_CACHE_TTL_SECONDS and
+            shared between callers - do not mutate.
+        """
+        if not self.supabase_client:
+            logger.warning("Supabase client not available")
+            return None
+
+        restaurant = self._public_cache.get(identifier)
+        if restaurant is not None:
+            return restaurant
+
+        try:
+            result = self.supabase_client.rpc('get_public_restaurant', {'p_identifier': identifier}).execute()
+            restaurant = result.data or None
+        except Exception as e:
+            logger.warning("get_public_restaurant RPC failed, using separate queries: %s", e)
+            restaurant = self.get_restaurant_by_id_or_slug(identifier)
+            if restaurant:
+                restaurant = {**restaurant, 'owner_role': None}
+
+        self._public_cache.set(identifier, restaurant)
+        return restaurant
+
+    def resolve_restaurant_id(self, identifier: str) -> Optional[str]:
+        """
+        แปลง restaurant ID หรือ slug เป็น restaurant UUID (cached 5 นาที)
+
+        Args:
+            identifier: Restaurant ID (UUID) หรือ slug
+
+        Returns:
+            Restaurant UUID or None if not found
+        """
+        restaurant_id = self._id_cache.get(identifier)
+        if restaurant_id:
+            return restaurant_id
+
+        restaurant = self.get_restaurant_by_id_or_slug(identifier)
+        restaurant_id = restaurant.get("id") if restaurant else None
+        self._id_cache.set(identifier, restaurant_id)
+        return restaurant_id
+
+    def get_cached_restaurant_id(self, identifier: str) -> Optional[str]:
+        """Restaurant UUID for identifier if already cached (no DB access)"""
+        return self._id_cache.get(identifier)
+
+    def cache_restaurant_id(self, identifier: str, restaurant_id: str) -> None:
+        """Remember identifier → UUID (e.g. when resolved as part of another query)"""
+        self._id_cache.set(identifier, restaurant_id)
+
+    async def resolve_restaurant_id_async(self, identifier: str) -> Optional[str]:
+        """Async version of resolve_restaurant_id - only hits Supabase (in a thread) on cache miss"""
+        restaurant_id = self._id_cache.get(identifier)
+        if restaurant_id:
+            return restaurant_id
+        return await asyncio.to_thread(self.resolve_restaurant_id, identifier)
     
     def create_restaurant(self, user_id: str, restaurant_data: Dict[str, Any]) -> Optional[Dict[str, Any]]:
         """
@@ -238,12 +368,12 @@ class RestaurantService:
             Dictionary with created restaurant data or None if failed
         """
         if not self.supabase_client:
-            print("⚠️ Restaurant Service: Supabase client not available")
+            logger.warning("Supabase client not available")
             return None
         
         # Validate UUID format
         if not self._is_valid_uuid(user_id):
-            print(f"⚠️ Restaurant Service: Invalid UUID format for user_id: {user_id}, cannot create restaurant")
+            logger.warning("Invalid UUID format for user_id: %s, cannot create restaurant", user_id)
             return None
         
         try:
@@ -264,7 +394,7 @@ class RestaurantService:
                         counter += 1
                         slug = f"{base_slug}-{counter}"
                     restaurant_data['slug'] = slug
-                    print(f"📝 Restaurant Service: Auto-generated slug: {slug}")
+                    logger.info("Auto-generated slug: %s", slug)
             
             # Check if theme_color column exists by trying to query schema
             # If column doesn't exist, remove it from restaurant_data
@@ -277,7 +407,7 @@ class RestaurantService:
             except Exception as schema_error:
                 # Column doesn't exist, remove theme_color from data
                 if 'theme_color' in restaurant_data:
-                    print(f"⚠️ Restaurant Service: theme_color column not found, removing from insert data")
+                    logger.warning("theme_color column not found, removing from insert data")
                     restaurant_data.pop('theme_color', None)
                 if 'cover_image_url' in restaurant_data:
                     restaurant_data.pop('cover_image_url', None)
@@ -286,17 +416,17 @@ class RestaurantService:
             
             if result.data and len(result.data) > 0:
                 restaurant = result.data[0]
-                print(f"✅ Restaurant Service: Created restaurant for user {user_id}")
+                logger.info("Created restaurant for user %s", user_id)
                 return restaurant
             else:
-                print(f"⚠️ Restaurant Service: Failed to create restaurant - no data returned")
+                logger.warning("Failed to create restaurant - no data returned")
                 return None
                 
         except Exception as e:
             error_msg = str(e)
             # Check if error is about missing columns
             if 'theme_color' in error_msg or 'cover_image_url' in error_msg:
-                print(f"⚠️ Restaurant Service: Missing columns in restaurants table. Please run migration: add_customization_to_restaurants.sql")
+                logger.warning("Missing columns in restaurants table. Please run migration: add_customization_to_restaurants.sql")
                 # Try again without theme_color and cover_image_url
                 try:
                     restaurant_data.pop('theme_color', None)
@@ -304,14 +434,12 @@ class RestaurantService:
                     result = self.supabase_client.table('restaurants').insert(restaurant_data).execute()
                     if result.data and len(result.data) > 0:
                         restaurant = result.data[0]
-                        print(f"✅ Restaurant Service: Created restaurant (without customization columns) for user {user_id}")
+                        logger.info("Created restaurant (without customization columns) for user %s", user_id)
                         return restaurant
                 except Exception as retry_error:
-                    print(f"❌ Restaurant Service: Failed to create restaurant after retry: {str(retry_error)}")
+                    logger.error("Failed to create restaurant after retry: %s", retry_error)
             
-            print(f"❌ Restaurant Service: Failed to create restaurant: {error_msg}")
-            import traceback
-            traceback.print_exc()
+            logger.exception("Failed to create restaurant")
             return None
     
     def update_restaurant(self, restaurant_id: str, user_id: str, update_data: Dict[str, Any]) -> Optional[Dict[str, Any]]:
@@ -327,11 +455,11 @@ class RestaurantService:
             Dictionary with updated restaurant data or None if failed
         """
         if not self.supabase_client:
-            print("⚠️ Restaurant Service: Supabase client not available")
+            logger.warning("Supabase client not available")
             return None
         
         if not self._is_valid_uuid(restaurant_id) or not self._is_valid_uuid(user_id):
-            print(f"⚠️ Restaurant Service: Invalid ID format, cannot update restaurant.")
+            logger.warning("Invalid ID format, cannot update restaurant.")
             return None
         
         try:
@@ -339,7 +467,7 @@ class RestaurantService:
             update_data = {k: v for k, v in update_data.items() if v is not None}
             
             if not update_data:
-                print("⚠️ Restaurant Service: No data to update")
+                logger.warning("No data to update")
                 return None
             
             # Check if optional columns exist
@@ -356,24 +484,28 @@ class RestaurantService:
                     except Exception as schema_error:
                         error_msg = str(schema_error)
                         if col in error_msg or 'PGRST204' in error_msg:
-                            print(f"⚠️ Restaurant Service: {col} column not found, removing from update data")
+                            logger.warning("%s column not found, removing from update data", col)
                             update_data.pop(col, None)
             
             if not update_data:
-                print("⚠️ Restaurant Service: No data to update after removing non-existent columns")
+                logger.warning("No data to update after removing non-existent columns")
                 return None
             
+            # Slug changes invalidate cached slug → id mappings
+            if 'slug' in update_data:
+                self._id_cache.clear()
+
             # Update restaurant (with user_id check for security)
             try:
                 result = self.supabase_client.table('restaurants').update(update_data).eq('id', restaurant_id).eq('user_id', user_id).execute()
                 
                 if result.data and len(result.data) > 0:
                     restaurant = result.data[0]
-                    print(f"✅ Restaurant Service: Updated restaurant {restaurant_id}")
-                    print(f"   Updated fields: {list(update_data.keys())}")
+                    self.invalidate_cache()
+                    logger.info("Updated restaurant %s fields=%s", restaurant_id, list(update_data.keys()))
                     return restaurant
                 else:
-                    print(f"⚠️ Restaurant Service: Failed to update restaurant - no data returned or restaurant not found")
+                    logger.warning("Failed to update restaurant - no data returned or restaurant not found")
                     return None
             except Exception as update_error:
                 error_msg = str(update_error)
@@ -382,11 +514,11 @@ class RestaurantService:
                     # Find which column is missing from error message
                     for col in optional_columns:
                         if col in error_msg:
-                            print(f"⚠️ Restaurant Service: {col} column not found during update, removing")
+                            logger.warning("%s column not found during update, removing", col)
                             update_data.pop(col, None)
 
                     if not update_data:
-                        print("⚠️ Restaurant Service: No data to update after removing non-existent columns")
+                        logger.warning("No data to update after removing non-existent columns")
                         return None
 
                     # Retry update without missing columns
@@ -394,20 +526,18 @@ class RestaurantService:
 
                     if result.data and len(result.data) > 0:
                         restaurant = result.data[0]
-                        print(f"✅ Restaurant Service: Updated restaurant {restaurant_id} (without some optional columns)")
-                        print(f"   Updated fields: {list(update_data.keys())}")
+                        self.invalidate_cache()
+                        logger.info("Updated restaurant %s (without some optional columns) fields=%s", restaurant_id, list(update_data.keys()))
                         return restaurant
                     else:
-                        print(f"⚠️ Restaurant Service: Retry update succeeded but no data returned")
+                        logger.warning("Retry update succeeded but no data returned")
                         return None
                 else:
                     # Re-raise if it's a different error
                     raise update_error
                 
-        except Exception as e:
-            print(f"❌ Restaurant Service: Failed to update restaurant: {str(e)}")
-            import traceback
-            traceback.print_exc()
+        except Exception:
+            logger.exception("Failed to update restaurant")
             return None
     
     def update_restaurant_logo(self, restaurant_id: str, user_id: str, logo_url: str) -> bool:
@@ -440,6 +570,46 @@ class RestaurantService:
         result = self.update_restaurant(restaurant_id, user_id, {'cover_image_url': cover_image_url})
         return result is not None
     
+    def update_restaurant_customization(self, restaurant_id: str, user_id: str, update_data: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """
+        อัปเดต theme_color / logo_url / cover_image_url ของร้าน (หาร้านจาก restaurant_id หรือร้านแรกของ user)
+
+        Uses the update_restaurant_customization RPC (one round trip, see
+        supabase/migrations/add_update_restaurant_customization_function.sql);
+        falls back to lookup by id → lookup by user_id → update_restaurant if the function is missing.
+
+        Args:
+            restaurant_id: Restaurant ID (may not exist - then the user's first restaurant is used)
+            user_id: User ID (must own the restaurant)
+            update_data: Any of theme_color, logo_url, cover_image_url
+
+        Returns:
+            Dictionary with updated restaurant data or None if not found / failed
+        """
+        if not self.supabase_client:
+            logger.warning("Supabase client not available")
+            return None
+
+        if not self._is_valid_uuid(user_id):
+            logger.warning("Invalid ID format, cannot update restaurant.")
+            return None
+
+        try:
+            result = self.supabase_client.rpc('update_restaurant_customization', {
+                'p_restaurant_id': restaurant_id,
+                'p_user_id': user_id,
+                'p_updates': update_data,
+            }).execute()
+            self.invalidate_cache()
+            return result.data[0] if result.data else None
+        except Exception as e:
+            logger.warning("update_restaurant_customization RPC failed, using separate queries: %s", e)
+
+        restaurant = self.get_restaurant_by_id_or_user(restaurant_id, user_id)
+        if not restaurant:
+            return None
+        return self.update_restaurant(restaurant.get('id'), user_id, update_data)
+    
     def delete_restaurant(self, restaurant_id: str, user_id: str) -> bool:
         """
         ลบร้านอาหาร (CASCADE: จะลบ menus, orders ทั้งหมดด้วย)
@@ -452,7 +622,7 @@ class RestaurantService:
             True if successful, False otherwise
         """
         if not self.supabase_client:
-            print("⚠️ Restaurant Service: Supabase client not available")
+            logger.warning("Supabase client not available")
             return False
         
         try:
@@ -460,16 +630,15 @@ class RestaurantService:
             result = self.supabase_client.table('restaurants').delete().eq('id', restaurant_id).eq('user_id', user_id).execute()
             
             if result.data:
-                print(f"✅ Restaurant Service: Deleted restaurant {restaurant_id}")
+                self.invalidate_cache(slug_changed=True)
+                logger.info("Deleted restaurant %s", restaurant_id)
                 return True
             else:
-                print(f"⚠️ Restaurant Service: Failed to delete restaurant {restaurant_id}")
+                logger.warning("Failed to delete restaurant %s", restaurant_id)
                 return False
                 
-        except Exception as e:
-            print(f"❌ Restaurant Service: Failed to delete restaurant: {str(e)}")
-            import traceback
-            traceback.print_exc()
+        except Exception:
+            logger.exception("Failed to delete restaurant")
             return False
 
 
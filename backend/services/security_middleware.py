@@ -1,7 +1,7 @@
 """
 Security Middleware for Smart Menu API
 - Rate Limiting (DDoS Protection)
-- Request Validation
+- Request Validation (body size limit)
 - Security Headers
 - IP Blocking
 """
@@ -141,6 +141,16 @@ def get_rate_limit_for_path(path: str) -> dict:
     return RATE_LIMITS["default"]
 
 
+# ============================================================
+# Request Size Limit
+# ============================================================
+
+# Largest request body accepted by any endpoint. Big enough for the biggest legitimate
+# payload (a 10MB photo sent base64-encoded in JSON, ~13.4MB) and rejected from the
+# Content-Length header before the body is read, parsed or validated.
+MAX_REQUEST_BODY_BYTES = int(os.getenv("MAX_REQUEST_BODY_BYTES", str(16 * 1024 * 1024)))
+
+
 # ============================================================
 # Security Headers
 # ============================================================
@@ -167,6 +177,9 @@ SECURITY_HEADERS = {
     "Expires": "0",
 }
 
+# Headers above that a route may override by setting its own Cache-Control
+CACHE_HEADERS = {"Cache-Control", "Pragma", "Expires"}
+
 
 # ============================================================
 # Input Sanitization
@@ -320,6 +333,39 @@ class RateLimitMiddleware(BaseHTTPMiddleware):
         return "unknown"
 
 
+# ============================================================
+# Request Size Limit Middleware
+# ============================================================
+
+class RequestSizeLimitMiddleware(BaseHTTPMiddleware):
+    """Middleware to reject oversized request bodies before they are read"""
+
+    async def dispatch(self, request: Request, call_next: Callable) -> Response:
+        content_length = request.headers.get("content-length")
+        if content_length:
+            try:
+                size = int(content_length)
+            except ValueError:
+                return JSONResponse(
+                    status_code=400,
+                    content={
+                        "error": "Bad Request",
+                        "message": "Invalid Content-Length header"
+                    }
+                )
+
+            if size > MAX_REQUEST_BODY_BYTES:
+                return JSONResponse(
+                    status_code=413,
+                    content={
+                        "error": "Payload Too Large",
+                        "message": f"Request body is {size} bytes, the limit is {MAX_REQUEST_BODY_BYTES} bytes"
+                    }
+                )
+
+        return await call_next(request)
+
+
 # ============================================================
 # Security Headers Middleware
 # ============================================================
@@ -330,8 +376,12 @@ class SecurityHeadersMiddleware(BaseHTTPMiddleware):
     async def dispatch(self, request: Request, call_next: Callable) -> Response:
         response = await call_next(request)
 
-        # Add security headers
+        # Add security headers (routes that set their own Cache-Control, e.g. ETag'd
+        # menu reads, keep it - the no-store defaults only apply to everything else)
+        keep_cache_headers = "cache-control" in response.headers
         for header, value in SECURITY_HEADERS.items():
+            if keep_cache_headers and header in CACHE_HEADERS:
+                continue
             response.headers[header] = value
 
         # Add request ID for tracing
@@ -367,6 +417,9 @@ def add_health_check(app):
 def setup_security(app):
     """Setup all security middleware"""
 
+    # Reject oversized bodies (inside the rate limiter so those requests still count)
+    app.add_middleware(RequestSizeLimitMiddleware)
+
     # Add rate limiting
     app.add_middleware(RateLimitMiddleware)
 
@@ -377,6 +430,7 @@ def setup_security(app):
     add_health_check(app)
 
     print("✅ Security middleware configured:")
+    print(f"   - Request body limit: {MAX_REQUEST_BODY_BYTES // (1024 * 1024)}MB")
     print("   - Rate limiting enabled")
     print("   - Security headers enabled")
     print("   - Health check endpoint added")
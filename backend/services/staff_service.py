@@ -6,9 +6,11 @@ from typing import Optional, Dict, Any, List
 from dotenv import load_dotenv
 import pathlib
 import secrets
+import traceback
 
 try:
-    from supabase import create_client, Client
+    from supabase import Client
+    from .supabase_client import get_supabase_client
     SUPABASE_AVAILABLE = True
 except ImportError:
     SUPABASE_AVAILABLE = False
@@ -30,7 +32,7 @@ class StaffService:
         self.supabase_client: Optional[Client] = None
         if SUPABASE_AVAILABLE and SUPABASE_URL and SUPABASE_KEY:
             try:
-                self.supabase_client = create_client(SUPABASE_URL, SUPABASE_KEY)
+                self.supabase_client = get_supabase_client(SUPABASE_URL, SUPABASE_KEY)
                 print("✅ Staff Service: Supabase client initialized")
             except Exception as e:
                 print(f"⚠️ Staff Service: Failed to initialize: {str(e)}")
@@ -193,7 +195,6 @@ class StaffService:
 
         except Exception as e:
             print(f"❌ Failed to verify PIN: {str(e)}")
-            import traceback
             traceback.print_exc()
             return None
     
@@ -0,0 +1,49 @@
+"""
+Supabase Storage helpers shared by the services that upload images
+"""
+
+import logging
+from typing import List
+
+logger = logging.getLogger(__name__)
+
+# Uploaded objects use content-addressed / unique names and are never overwritten, so browsers
+# and the Supabase CDN may keep them for a year (storage3 sends Cache-Control: max-age=<value>)
+IMMUTABLE_CACHE_SECONDS = "31536000"
+
+
+def remove_superseded_objects(client, bucket: str, folder: str, prefix: str, keep_path: str) -> List[str]:
+    """
+    Delete older uploads of the same asset after a new content-hash name has been saved
+
+    Content-hash names never overwrite the previous object, so every re-upload would otherwise
+    leave the old file orphaned in the bucket.
+
+    Args:
+        client: Supabase client
+        bucket: Storage bucket name
+        folder: Folder inside the bucket ('' for the bucket root)
+        prefix: Filename prefix shared by every version of the asset (e.g. "<restaurant_id>_")
+        keep_path: Full object path of the version that is now referenced
+
+    Returns:
+        Object paths that were removed
+    """
+    try:
+        entries = client.storage.from_(bucket).list(folder, {"search": prefix}) or []
+        stale = []
+        for entry in entries:
+            name = entry.get('name') if isinstance(entry, dict) else None
+            if not name or not name.startswith(prefix):
+                continue
+            path = f"{folder}/{name}" if folder else name
+            if path != keep_path:
+                stale.append(path)
+        if stale:
+            client.storage.from_(bucket).remove(stale)
+            logger.info("Removed %d superseded object(s) from %s: %s", len(stale), bucket, stale)
+        return stale
+    except Exception:
+        # Cleanup is best-effort: the new object is already saved and referenced
+        logger.exception("Failed to remove superseded objects bucket=%s folder=%s prefix=%s", bucket, folder, prefix)
+        return []
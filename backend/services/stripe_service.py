@@ -15,6 +15,8 @@ class StripeService:
     
     def __init__(self):
         self.api_key = os.getenv('STRIPE_SECRET_KEY')
+        # Read once - construct_webhook_event runs on every webhook delivery
+        self.webhook_secret = os.getenv('STRIPE_WEBHOOK_SECRET')
         if not self.api_key:
             print("⚠️ WARNING: STRIPE_SECRET_KEY not found. Payment features will not work.")
         else:
@@ -291,23 +293,25 @@ class StripeService:
 
     def create_payment_intent(
         self,
-        amount: float,
+        amount_cents: int,
         currency: str = 'nzd',
         order_id: str = None,
         restaurant_id: str = None,
         customer_email: str = None,
         description: str = None,
+        idempotency_key: str = None,
     ) -> Dict[str, Any]:
         """
         Create a Stripe Payment Intent for one-time order payments
 
         Args:
-            amount: Amount in dollars (will be converted to cents)
+            amount_cents: Amount in cents (already converted by the request model)
             currency: Currency code (default: nzd)
             order_id: Order ID for metadata
             restaurant_id: Restaurant ID for metadata
             customer_email: Customer email (optional)
             description: Payment description
+            idempotency_key: Stripe idempotency key (retries return the same intent)
 
         Returns:
             Dictionary with client_secret and payment_intent_id
@@ -316,9 +320,6 @@ class StripeService:
             if not self.api_key:
                 raise Exception("Stripe API key not configured")
 
-            # Convert amount to cents
-            amount_cents = int(amount * 100)
-
             # Build metadata
             metadata = {}
             if order_id:
@@ -343,12 +344,15 @@ class StripeService:
                 intent_params['receipt_email'] = customer_email
 
             # Create the Payment Intent
-            intent = stripe.PaymentIntent.create(**intent_params)
+            if idempotency_key:
+                intent = stripe.PaymentIntent.create(**intent_params, idempotency_key=idempotency_key)
+            else:
+                intent = stripe.PaymentIntent.create(**intent_params)
 
             return {
                 'client_secret': intent.client_secret,
                 'payment_intent_id': intent.id,
-                'amount': amount,
+                'amount': amount_cents / 100,
                 'currency': currency,
                 'status': intent.status,
             }
@@ -358,6 +362,32 @@ class StripeService:
         except Exception as e:
             raise Exception(f"Failed to create payment intent: {str(e)}")
 
+    def cancel_payment_intent(self, payment_intent_id: str) -> Dict[str, Any]:
+        """
+        Cancel a Payment Intent that will not be paid (e.g. created for an order that does not exist)
+
+        Args:
+            payment_intent_id: Stripe Payment Intent ID
+
+        Returns:
+            Dictionary with payment_intent_id and status
+        """
+        try:
+            if not self.api_key:
+                raise Exception("Stripe API key not configured")
+
+            intent = stripe.PaymentIntent.cancel(payment_intent_id)
+
+            return {
+                'payment_intent_id': intent.id,
+                'status': intent.status,
+            }
+
+        except stripe.error.StripeError as e:
+            raise Exception(f"Stripe error: {str(e)}")
+        except Exception as e:
+            raise Exception(f"Failed to cancel payment intent: {str(e)}")
+
     def retrieve_payment_intent(self, payment_intent_id: str) -> Dict[str, Any]:
         """
         Retrieve a Payment Intent to check its status
@@ -486,12 +516,13 @@ class StripeService:
             Verified Stripe Event object
         """
         try:
-            webhook_secret = os.getenv('STRIPE_WEBHOOK_SECRET')
-            if not webhook_secret:
+            if not self.webhook_secret:
                 raise Exception("Stripe webhook secret not configured")
 
+            # stripe.Webhook verifies with hmac.new(..., hashlib.sha256) + hmac.compare_digest
+            # (OpenSSL-backed) - no pure-Python HMAC on this path
             event = stripe.Webhook.construct_event(
-                payload, sig_header, webhook_secret
+                payload, sig_header, self.webhook_secret
             )
             return event
 
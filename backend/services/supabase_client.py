@@ -0,0 +1,60 @@
+"""
+Shared Supabase client - one client (and one HTTP connection pool) per credential pair
+ทุก service ใช้ client ตัวเดียวกัน แทนที่จะสร้าง client/connection pool แยกกันทุก service
+"""
+
+import os
+import threading
+from typing import Dict, Tuple
+
+import httpx
+from supabase import create_client, Client, ClientOptions
+
+# Keep-alive pool behind PostgREST calls. Up to BLOCKING_IO_WORKERS threads share the client,
+# and httpx's defaults (20 idle connections, dropped after 5s) would make busy workers
+# re-do the TCP + TLS handshake to Supabase
+SUPABASE_MAX_CONNECTIONS = int(os.getenv("SUPABASE_MAX_CONNECTIONS", "50"))
+SUPABASE_KEEPALIVE_SECONDS = float(os.getenv("SUPABASE_KEEPALIVE_SECONDS", "60"))
+SUPABASE_TIMEOUT_SECONDS = 30
+
+# APIError.code when an RPC is not deployed yet: PostgREST "function not found in schema
+# cache" / Postgres undefined_function. Callers fall back to plain queries only on these.
+MISSING_FUNCTION_ERROR_CODES = ('PGRST202', '42883')
+
+_clients: Dict[Tuple[str, str], Client] = {}
+_lock = threading.Lock()
+
+
+def _client_options() -> ClientOptions:
+    """ClientOptions with a pooled httpx client (older supabase-py without httpx_client: timeout only)"""
+    try:
+        return ClientOptions(
+            postgrest_client_timeout=SUPABASE_TIMEOUT_SECONDS,
+            httpx_client=httpx.Client(
+                timeout=SUPABASE_TIMEOUT_SECONDS,
+                limits=httpx.Limits(
+                    max_connections=SUPABASE_MAX_CONNECTIONS,
+                    max_keepalive_connections=SUPABASE_MAX_CONNECTIONS,
+                    keepalive_expiry=SUPABASE_KEEPALIVE_SECONDS,
+                ),
+            ),
+        )
+    except TypeError:
+        return ClientOptions(postgrest_client_timeout=SUPABASE_TIMEOUT_SECONDS)
+
+
+def get_supabase_client(url: str, key: str) -> Client:
+    """
+    Return the process-wide Supabase client for (url, key), creating it on first use
+
+    Services resolve their own credentials from env; in practice they all resolve to the
+    same service-role key, so they end up sharing a single client.
+    """
+    client = _clients.get((url, key))
+    if client is None:
+        with _lock:
+            client = _clients.get((url, key))
+            if client is None:
+                client = create_client(url, key, options=_client_options())
+                _clients[(url, key)] = client
+    return client
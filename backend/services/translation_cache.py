@@ -0,0 +1,120 @@
+"""
+Translation Cache - in-process LRU cache for AI translation / language detection
+เก็บผลแปลไว้ใน memory เพื่อไม่ต้องเรียก Gemini ซ้ำสำหรับข้อความเดิม (เช่น "Pad Thai")
+"""
+
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+
+# AI output for a text can still be stale (prompt/model changes, "re-translate" requests),
+# so entries expire instead of living for the whole process
+TRANSLATION_CACHE_TTL_SECONDS = int(os.getenv("TRANSLATION_CACHE_TTL_SECONDS", "21600"))
+
+
+def menu_item_texts(menu_item: Dict[str, Any]) -> List[str]:
+    """Translatable source texts of a menu item: name, description, category, meat and add-on names"""
+    return [
+        menu_item.get("name") or "",
+        menu_item.get("description") or "",
+        menu_item.get("category") or "",
+        *[(meat or {}).get("name") or "" for meat in (menu_item.get("meats") or [])],
+        *[(addon or {}).get("name") or "" for addon in (menu_item.get("addOns") or [])],
+    ]
+
+
+def compute_source_hash(menu_item: Dict[str, Any]) -> str:
+    """
+    Hash of a menu item's translatable source text (used as menu_translations.source_hash)
+
+    Scheme: blake2b(digest_size=16) over UTF-8 of
+    name|description|category|<meat names...>|<add-on names...>
+    A cached translation is stale when this hash changes.
+    """
+    return hashlib.blake2b("|".join(menu_item_texts(menu_item)).encode("utf-8"), digest_size=16).hexdigest()
+
+
+class TranslationCache:
+    """
+    Thread-safe LRU cache keyed by (text hash, source language, target language)
+
+    Used by AIService before calling the model. Menu-level translations are
+    still cached in Supabase (menu_translations table); this sits in front of
+    the model for repeated texts across menus and requests. Entries expire
+    `ttl` seconds after they were set.
+    """
+
+    def __init__(self, maxsize: int = 10_000, ttl: float = TRANSLATION_CACHE_TTL_SECONDS):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: "OrderedDict[Tuple[str, str, str], Tuple[float, str]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def text_key(text: str) -> str:
+        """blake2b of the source text (first part of every cache key)"""
+        return hashlib.blake2b(text.encode("utf-8"), digest_size=16).hexdigest()
+
+    @classmethod
+    def make_key(cls, text: str, source_lang: str, target_lang: str) -> Tuple[str, str, str]:
+        """Build cache key: (blake2b(text), src, tgt)"""
+        return cls.text_key(text), source_lang, target_lang
+
+    def get(self, text: str, source_lang: str, target_lang: str) -> Optional[str]:
+        """Return cached value or None (missing or expired)"""
+        key = self.make_key(text, source_lang, target_lang)
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None and entry[0] < time.monotonic():
+                del self._data[key]
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def set(self, text: str, source_lang: str, target_lang: str, value: str) -> None:
+        """Store value, evicting the least recently used entry when full"""
+        key = self.make_key(text, source_lang, target_lang)
+        with self._lock:
+            self._data[key] = (time.monotonic() + self.ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def delete(self, text: str, source_lang: str, target_lang: str) -> None:
+        """Remove a single entry (if present)"""
+        key = self.make_key(text, source_lang, target_lang)
+        with self._lock:
+            self._data.pop(key, None)
+
+    def delete_texts(self, texts: Iterable[str]) -> int:
+        """Remove every language pair cached for these source texts (e.g. one menu item's); returns entries removed"""
+        text_keys = {self.text_key(text) for text in texts if text}
+        if not text_keys:
+            return 0
+        with self._lock:
+            stale = [key for key in self._data if key[0] in text_keys]
+            for key in stale:
+                del self._data[key]
+        return len(stale)
+
+    def clear(self) -> None:
+        """Remove all entries"""
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+
+# Global instance
+translation_cache = TranslationCache()
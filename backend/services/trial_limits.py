@@ -6,7 +6,7 @@ Updated pricing structure:
 - Professional ($89): Unlimited menus, 200 gen, 200 enhance
 - Enterprise ($199): Unlimited menus, 500 gen, 500 enhance
 """
-from typing import Dict, Any, Optional
+from typing import Dict, Any, Optional, Tuple
 from datetime import datetime, timedelta
 from collections import defaultdict
 import json
@@ -14,6 +14,20 @@ import os
 from pathlib import Path
 from .user_role_service import user_role_service
 
+# Role (user_profiles.role) → subscription plan; free trial has no plan
+ROLE_TO_PLAN = {
+    'free_trial': None,
+    'starter': 'starter',
+    'professional': 'professional',
+    'enterprise': 'enterprise',
+    'admin': 'enterprise'  # Admin gets enterprise features
+}
+
+# check_limit() sentinel for "no limit" (remaining/limit) - plain int, no float('inf') checks
+UNLIMITED = -1
+# How unlimited is shown to the webapp in JSON responses (it compares against 999999)
+UNLIMITED_JSON_VALUE = 999999
+
 class TrialLimitsService:
     """
     จัดการข้อจำกัดการใช้งานสำหรับ Free Trial (14 วัน) และ Subscription Plans
@@ -151,6 +165,22 @@ class TrialLimitsService:
         
         return self.get_user_status(user_id)
     
+    def get_user_plan(self, user_id: str) -> Tuple[str, str]:
+        """
+        plan + role สำหรับเช็คสิทธิ์ฟีเจอร์ (theme color, cover image)
+
+        Uses only the cached role from user_role_service - no usage data or
+        trial bookkeeping like get_user_status().
+
+        Args:
+            user_id: User ID
+
+        Returns:
+            (plan, role) - plan is 'starter' for users without a subscription
+        """
+        user_role = user_role_service.get_user_role(user_id)
+        return ROLE_TO_PLAN.get(user_role) or 'starter', user_role
+    
     def get_user_status(self, user_id: str) -> Dict[str, Any]:
         """
         ดึงสถานะ trial ของ user
@@ -165,15 +195,7 @@ class TrialLimitsService:
         user_role = user_role_service.get_user_role(user_id)
         
         # Map role to subscription plan
-        role_to_plan = {
-            'free_trial': None,
-            'starter': 'starter',
-            'professional': 'professional',
-            'enterprise': 'enterprise',
-            'admin': 'enterprise'  # Admin gets enterprise features
-        }
-        
-        plan_from_role = role_to_plan.get(user_role)
+        plan_from_role = ROLE_TO_PLAN.get(user_role)
         is_subscribed = plan_from_role is not None
         
         # Initialize if not exists
@@ -225,16 +247,16 @@ class TrialLimitsService:
         Returns:
             Dictionary with:
             - allowed: bool
-            - remaining: int
-            - limit: int
+            - remaining: int (UNLIMITED = -1 for no limit)
+            - limit: int (UNLIMITED = -1 for no limit)
             - message: str
         """
         # Check if user is admin - admins have unlimited access
         if user_role_service.is_admin(user_id):
             return {
                 "allowed": True,
-                "remaining": 999999,  # Use large number instead of inf for JSON compatibility
-                "limit": 999999,
+                "remaining": UNLIMITED,
+                "limit": UNLIMITED,
                 "message": "Unlimited access (Admin)"
             }
         
@@ -272,11 +294,11 @@ class TrialLimitsService:
                 }
             
             # Check if limit is unlimited (represented as -1 or very large number)
-            if limit == float('inf') or limit == -1 or limit >= 999999:
+            if limit == UNLIMITED or limit >= UNLIMITED_JSON_VALUE:
                 return {
                     "allowed": True,
-                    "remaining": 999999,  # Use large number instead of inf for JSON compatibility
-                    "limit": 999999,
+                    "remaining": UNLIMITED,
+                    "limit": UNLIMITED,
                     "message": f"Unlimited access (Plan: {plan.title()})"
                 }
             
@@ -3,12 +3,22 @@ User Role Service - จัดการ User Roles และ Permissions
 """
 import os
 from typing import Optional, Dict, Any, List
-from supabase import create_client, Client
+from supabase import Client
+
+from .supabase_client import get_supabase_client
+from .ttl_cache import TTLCache
+from .ids import is_uuid
 
 # Supabase configuration
 SUPABASE_URL = os.getenv('SUPABASE_URL') or os.getenv('NEXT_PUBLIC_SUPABASE_URL')
 SUPABASE_KEY = os.getenv('SUPABASE_SERVICE_ROLE_KEY') or os.getenv('SUPABASE_KEY') or os.getenv('NEXT_PUBLIC_SUPABASE_ANON_KEY')
 
+# Roles change about once per billing cycle; image endpoints look them up per request
+USER_ROLE_CACHE_TTL_SECONDS = 60
+
+# user_ids per IN (...) filter - keeps the PostgREST query string well under URL limits
+USER_ID_BATCH_SIZE = 100
+
 # Available roles
 AVAILABLE_ROLES = ['free_trial', 'starter', 'professional', 'enterprise', 'admin']
 
@@ -28,12 +38,22 @@ class UserRoleService:
         self.supabase_client: Optional[Client] = None
         if SUPABASE_URL and SUPABASE_KEY:
             try:
-                self.supabase_client = create_client(SUPABASE_URL, SUPABASE_KEY)
+                self.supabase_client = get_supabase_client(SUPABASE_URL, SUPABASE_KEY)
                 print("✅ User Role Service: Supabase client initialized")
             except Exception as e:
                 print(f"⚠️ User Role Service: Failed to initialize Supabase client: {str(e)}")
         else:
             print("⚠️ User Role Service: Supabase credentials not found")
+
+        # user_id -> role (real users only, not the testing-mode fallback)
+        self._role_cache = TTLCache(10_000, USER_ROLE_CACHE_TTL_SECONDS)
+
+    def invalidate_user_role(self, user_id: Optional[str] = None) -> None:
+        """Forget cached role for a user (or all users) after a role/plan change"""
+        if user_id is None:
+            self._role_cache.clear()
+        else:
+            self._role_cache.delete(user_id)
     
     def get_user_role(self, user_id: str) -> str:
         """
@@ -61,10 +81,16 @@ class UserRoleService:
                 pass
             return 'free_trial'
         
+        cached_role = self._role_cache.get(user_id)
+        if cached_role is not None:
+            return cached_role
+
         try:
             result = self.supabase_client.table('user_profiles').select('role').eq('user_id', user_id).execute()
             if result.data and len(result.data) > 0:
-                return result.data[0].get('role', 'free_trial')
+                role = result.data[0].get('role', 'free_trial')
+                self._role_cache.set(user_id, role)
+                return role
         except Exception as e:
             error_msg = str(e)
             # If it's a UUID format error, return default role
@@ -77,12 +103,7 @@ class UserRoleService:
     
     def _is_valid_uuid(self, uuid_string: str) -> bool:
         """ตรวจสอบว่า string เป็น UUID format หรือไม่"""
-        import re
-        uuid_pattern = re.compile(
-            r'^[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}$',
-            re.IGNORECASE
-        )
-        return bool(uuid_pattern.match(uuid_string))
+        return is_uuid(uuid_string)
     
     def set_user_role(self, user_id: str, role: str, admin_user_id: str) -> Dict[str, Any]:
         """
@@ -125,6 +146,7 @@ class UserRoleService:
                 result = self.supabase_client.table('user_profiles').update({
                     'role': role
                 }).eq('user_id', user_id).execute()
+                self.invalidate_user_role(user_id)
                 
                 if result.data:
                     print(f"✅ Updated user {user_id} role to {role}")
@@ -137,6 +159,7 @@ class UserRoleService:
                     'user_id': user_id,
                     'role': role
                 }).execute()
+                self.invalidate_user_role(user_id)
                 
                 if result.data:
                     print(f"✅ Created user profile for {user_id} with role {role}")
@@ -191,29 +214,30 @@ class UserRoleService:
             result = self.supabase_client.table('user_profiles').select('*').execute()
             users = result.data or []
             
-            # If email or restaurant_name is missing, try to sync from related tables
-            for user in users:
-                user_id = user.get('user_id')
-                if not user_id:
+            # Fill in missing restaurant_name from restaurants - one IN query per batch
+            # of users instead of one query per user
+            missing_ids = [
+                user['user_id'] for user in users
+                if user.get('user_id') and not user.get('restaurant_name')
+            ]
+            restaurant_names: Dict[str, str] = {}
+            for start in range(0, len(missing_ids), USER_ID_BATCH_SIZE):
+                try:
+                    restaurant_result = (
+                        self.supabase_client.table('restaurants')
+                        .select('user_id,name')
+                        .in_('user_id', missing_ids[start:start + USER_ID_BATCH_SIZE])
+                        .execute()
+                    )
+                except Exception:
                     continue
-                
-                # Sync email from auth.users if missing
-                if not user.get('email'):
-                    try:
-                        # Note: We can't directly query auth.users via Supabase client
-                        # The trigger should handle this, but we can try to get from restaurants
-                        pass
-                    except:
-                        pass
-                
-                # Sync restaurant_name from restaurants if missing
-                if not user.get('restaurant_name'):
-                    try:
-                        restaurant_result = self.supabase_client.table('restaurants').select('name').eq('user_id', user_id).limit(1).execute()
-                        if restaurant_result.data and len(restaurant_result.data) > 0:
-                            user['restaurant_name'] = restaurant_result.data[0].get('name')
-                    except:
-                        pass
+                for row in restaurant_result.data or []:
+                    # First restaurant per user, like the old limit(1) lookup
+                    restaurant_names.setdefault(row.get('user_id'), row.get('name'))
+
+            for user in users:
+                if not user.get('restaurant_name') and user.get('user_id') in restaurant_names:
+                    user['restaurant_name'] = restaurant_names[user['user_id']]
             
             return users
         except Exception as e:
@@ -0,0 +1,48 @@
+"""
+Test Unhandled Errors Keep CORS Headers
+ตรวจว่า route ที่ error โดยไม่คาดคิดยังตอบ 500 (JSON) พร้อม Access-Control-Allow-Origin
+ไม่อย่างนั้นหน้าเว็บ (คนละ origin) จะเห็นเป็น network/CORS error แทน error detail
+"""
+from unittest import mock
+
+from fastapi.testclient import TestClient
+
+from main_ai import app, trial_limits_service
+
+ORIGIN = "http://localhost:3000"
+FAILING_PATH = "/api/__test__/unhandled-error"
+
+
+async def _failing_route():
+    raise RuntimeError("internal details that must not reach the client")
+
+
+if not any(getattr(route, "path", None) == FAILING_PATH for route in app.routes):
+    app.add_api_route(FAILING_PATH, _failing_route, methods=["GET"], include_in_schema=False)
+
+
+def test_unhandled_error_keeps_cors_headers():
+    client = TestClient(app, raise_server_exceptions=False)
+    response = client.get(FAILING_PATH, headers={"Origin": ORIGIN})
+
+    assert response.status_code == 500
+    assert response.json() == {"detail": "Internal server error"}
+    assert response.headers.get("access-control-allow-origin") == ORIGIN
+
+
+def test_route_without_try_except_keeps_cors_headers():
+    # Routes no longer wrap service calls in try/except - a service failure must still
+    # reach the browser as a readable JSON 500
+    client = TestClient(app, raise_server_exceptions=False)
+    with mock.patch.object(trial_limits_service, "get_user_status", side_effect=RuntimeError("db down")):
+        response = client.get("/api/trial/status/default", headers={"Origin": ORIGIN})
+
+    assert response.status_code == 500
+    assert response.json() == {"detail": "Internal server error"}
+    assert response.headers.get("access-control-allow-origin") == ORIGIN
+
+
+if __name__ == "__main__":
+    test_unhandled_error_keeps_cors_headers()
+    test_route_without_try_except_keeps_cors_headers()
+    print("✅ Unhandled errors return a generic 500 with CORS headers")
@@ -0,0 +1,23 @@
+-- Shared restaurant lookup for the RPCs that accept a restaurant UUID or slug
+-- (get_menu_translations_for_slug, get_public_restaurant, create_service_request_by_slug)
+-- Branches on the identifier's shape so each lookup uses an index: the primary key for
+-- UUIDs, idx_restaurants_slug for slugs. "id::text = x OR slug = x" casts the key column
+-- and scans the whole table instead.
+-- Apply before the functions above (the date prefix sorts it first)
+-- Returns NULL when no restaurant matches
+
+CREATE OR REPLACE FUNCTION restaurant_id_for_identifier(p_identifier TEXT)
+RETURNS UUID
+LANGUAGE plpgsql
+STABLE
+AS $$
+BEGIN
+    -- IF (not CASE/AND) so the ::uuid cast is never evaluated for a slug
+    IF p_identifier ~* '^[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}$' THEN
+        RETURN (SELECT id FROM restaurants WHERE id = p_identifier::uuid);
+    END IF;
+    RETURN (SELECT id FROM restaurants WHERE slug = p_identifier LIMIT 1);
+END;
+$$;
+
+COMMENT ON FUNCTION restaurant_id_for_identifier(TEXT) IS 'Restaurant UUID for a UUID or slug identifier (index lookup), NULL if not found';
@@ -0,0 +1,36 @@
+-- Resolve restaurant (UUID or slug) and insert a service request in one call
+-- Used by POST /api/service-requests (call waiter, request bill, ...) when the
+-- restaurant ID is not cached yet, instead of restaurant lookup → insert
+-- (backend falls back to the separate queries if missing)
+-- Requires restaurant_id_for_identifier (20261016_add_restaurant_id_for_identifier_function.sql)
+-- Returns NULL when the restaurant does not exist, otherwise the inserted
+-- service_requests row as JSON
+
+CREATE OR REPLACE FUNCTION create_service_request_by_slug(
+    p_identifier TEXT,
+    p_table_no TEXT,
+    p_request_type TEXT,
+    p_message TEXT DEFAULT NULL
+)
+RETURNS JSONB
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    v_restaurant_id UUID;
+    v_request service_requests;
+BEGIN
+    v_restaurant_id := restaurant_id_for_identifier(p_identifier);
+
+    IF v_restaurant_id IS NULL THEN
+        RETURN NULL;
+    END IF;
+
+    INSERT INTO service_requests (restaurant_id, table_no, request_type, message, status)
+    VALUES (v_restaurant_id, p_table_no, p_request_type, p_message, 'pending')
+    RETURNING * INTO v_request;
+
+    RETURN to_jsonb(v_request);
+END;
+$$;
+
+COMMENT ON FUNCTION create_service_request_by_slug(TEXT, TEXT, TEXT, TEXT) IS 'Insert a pending service request for a restaurant given by UUID or slug in one round trip';
@@ -0,0 +1,41 @@
+-- Per-menu sales totals for a restaurant over a date range, aggregated in the database
+-- Used by GET /api/best-sellers and the bestseller flag update so the backend does not
+-- download every order's items JSON; ranking (pinned items, thresholds) stays in the backend
+-- (backend falls back to counting client-side if missing)
+-- Counts match the backend: cancelled orders are skipped, a line item without
+-- "quantity" counts as 1, fractional quantities ("2.0") are rounded and order_count
+-- is the number of order lines
+
+CREATE OR REPLACE FUNCTION get_best_seller_sales(
+    p_restaurant_id UUID,
+    p_start TIMESTAMPTZ,
+    p_end TIMESTAMPTZ
+)
+RETURNS TABLE (
+    menu_id TEXT,
+    name TEXT,
+    "nameEn" TEXT,
+    total_quantity BIGINT,
+    order_count BIGINT
+)
+LANGUAGE sql
+STABLE
+AS $$
+    SELECT
+        item->>'menu_id' AS menu_id,
+        COALESCE(MIN(item->>'name'), '') AS name,
+        COALESCE(MIN(item->>'nameEn'), '') AS "nameEn",
+        SUM(COALESCE(ROUND(NULLIF(item->>'quantity', '')::NUMERIC), 1))::BIGINT AS total_quantity,
+        COUNT(*)::BIGINT AS order_count
+    FROM orders o
+    CROSS JOIN LATERAL jsonb_array_elements(o.items) AS item
+    WHERE o.restaurant_id = p_restaurant_id
+      AND o.created_at >= p_start
+      AND o.created_at <= p_end
+      AND o.status <> 'cancelled'
+      AND jsonb_typeof(o.items) = 'array'
+      AND NULLIF(item->>'menu_id', '') IS NOT NULL
+    GROUP BY item->>'menu_id';
+$$;
+
+COMMENT ON FUNCTION get_best_seller_sales(UUID, TIMESTAMPTZ, TIMESTAMPTZ) IS 'Total quantity and order-line count per menu_id from non-cancelled orders in a date range';
@@ -0,0 +1,23 @@
+-- Menu statistics for a restaurant, aggregated in the database
+-- Used by GET /api/menu-stats so the backend does not fetch every menu row
+-- (backend falls back to counting client-side if missing)
+
+CREATE OR REPLACE FUNCTION get_menu_stats(p_restaurant_id UUID)
+RETURNS TABLE (
+    total_items INTEGER,
+    categories INTEGER,
+    with_images INTEGER
+)
+LANGUAGE sql
+STABLE
+AS $$
+    SELECT
+        COUNT(*)::INTEGER AS total_items,
+        COUNT(DISTINCT NULLIF(category, ''))::INTEGER AS categories,
+        (COUNT(*) FILTER (WHERE NULLIF(image_url, '') IS NOT NULL))::INTEGER AS with_images
+    FROM menus
+    WHERE restaurant_id = p_restaurant_id
+      AND is_active = TRUE;
+$$;
+
+COMMENT ON FUNCTION get_menu_stats(UUID) IS 'Active menu item count, distinct category count and items-with-image count for a restaurant';
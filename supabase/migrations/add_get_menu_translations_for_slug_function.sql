@@ -0,0 +1,32 @@
+-- Resolve restaurant (UUID or slug) and fetch its menu translations in one call
+-- Used by GET /api/translations/menu/{restaurant_id}/{language_code} when the
+-- slug → UUID mapping is not cached yet (backend falls back to two queries if missing)
+-- Requires restaurant_id_for_identifier (20261016_add_restaurant_id_for_identifier_function.sql)
+-- Returns NULL when the restaurant does not exist, otherwise
+-- {"restaurant_id": <uuid>, "translations": [<menu_translations rows>]}
+
+CREATE OR REPLACE FUNCTION get_menu_translations_for_slug(
+    p_identifier TEXT,
+    p_language_code TEXT
+)
+RETURNS JSONB
+LANGUAGE sql
+STABLE
+AS $$
+    SELECT jsonb_build_object(
+        'restaurant_id', r.id,
+        'translations', COALESCE(
+            (
+                SELECT jsonb_agg(to_jsonb(mt))
+                FROM menu_translations mt
+                WHERE mt.restaurant_id = r.id
+                  AND mt.language_code = p_language_code
+            ),
+            '[]'::jsonb
+        )
+    )
+    FROM restaurants r
+    WHERE r.id = restaurant_id_for_identifier(p_identifier);
+$$;
+
+COMMENT ON FUNCTION get_menu_translations_for_slug(TEXT, TEXT) IS 'Resolve restaurant by UUID or slug and return its menu_translations for a language in one round trip';
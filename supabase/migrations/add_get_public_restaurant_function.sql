@@ -0,0 +1,22 @@
+-- Resolve restaurant (UUID or slug) together with its owner's role in one call
+-- Used by GET /api/public/menu/{restaurant_id} (customer menu page) instead of
+-- restaurant lookup → user_profiles role lookup
+-- (backend falls back to the separate queries if missing)
+-- restaurants.user_id references auth.users, not user_profiles, so PostgREST
+-- cannot embed the profile - the join lives here instead
+-- Requires restaurant_id_for_identifier (20261016_add_restaurant_id_for_identifier_function.sql)
+-- Returns NULL when the restaurant does not exist, otherwise the restaurants row
+-- as JSON plus "owner_role" (NULL when the owner has no user_profiles row)
+
+CREATE OR REPLACE FUNCTION get_public_restaurant(p_identifier TEXT)
+RETURNS JSONB
+LANGUAGE sql
+STABLE
+AS $$
+    SELECT to_jsonb(r) || jsonb_build_object('owner_role', up.role)
+    FROM restaurants r
+    LEFT JOIN user_profiles up ON up.user_id = r.user_id
+    WHERE r.id = restaurant_id_for_identifier(p_identifier);
+$$;
+
+COMMENT ON FUNCTION get_public_restaurant(TEXT) IS 'Restaurant row (by UUID or slug) plus owner_role from user_profiles in one round trip';
@@ -0,0 +1,13 @@
+-- Composite indexes for the per-restaurant order queries
+-- idx_orders_restaurant_created: GET /api/orders (restaurant, newest first, paged) and
+--   get_best_seller_sales (restaurant + created_at range)
+-- idx_orders_restaurant_status_created: GET /api/orders?status=... (restaurant + status,
+--   newest first) - the existing (restaurant_id, status) index still needs a sort
+-- On a large live orders table, run these as CREATE INDEX CONCURRENTLY in the SQL editor
+-- (CONCURRENTLY cannot run inside a migration transaction)
+
+CREATE INDEX IF NOT EXISTS idx_orders_restaurant_created
+    ON public.orders(restaurant_id, created_at DESC);
+
+CREATE INDEX IF NOT EXISTS idx_orders_restaurant_status_created
+    ON public.orders(restaurant_id, status, created_at DESC);
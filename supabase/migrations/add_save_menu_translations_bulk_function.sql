@@ -0,0 +1,58 @@
+-- Bulk save for the menu translation cache
+-- Upserts all rows in one call and skips rows whose source_hash is unchanged,
+-- so re-saving a mostly unchanged menu writes nothing.
+-- Used by POST /api/translations/menu (backend falls back to client-side upsert if missing)
+
+CREATE OR REPLACE FUNCTION save_menu_translations_bulk(
+    p_restaurant_id UUID,
+    p_language_code TEXT,
+    p_rows JSONB
+)
+RETURNS INTEGER
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    changed_count INTEGER;
+BEGIN
+    INSERT INTO menu_translations (
+        restaurant_id,
+        menu_id,
+        language_code,
+        translated_name,
+        translated_description,
+        translated_category,
+        translated_meats,
+        translated_addons,
+        source_hash,
+        updated_at
+    )
+    SELECT
+        p_restaurant_id,
+        r.menu_id,
+        p_language_code,
+        r.translated_name,
+        r.translated_description,
+        r.translated_category,
+        r.translated_meats,
+        r.translated_addons,
+        r.source_hash,
+        NOW()
+    -- Column types come from the table itself
+    FROM jsonb_populate_recordset(NULL::menu_translations, p_rows) AS r
+    ON CONFLICT (restaurant_id, menu_id, language_code) DO UPDATE SET
+        translated_name = EXCLUDED.translated_name,
+        translated_description = EXCLUDED.translated_description,
+        translated_category = EXCLUDED.translated_category,
+        translated_meats = EXCLUDED.translated_meats,
+        translated_addons = EXCLUDED.translated_addons,
+        source_hash = EXCLUDED.source_hash,
+        updated_at = NOW()
+    WHERE EXCLUDED.source_hash IS NULL
+       OR menu_translations.source_hash IS DISTINCT FROM EXCLUDED.source_hash;
+
+    GET DIAGNOSTICS changed_count = ROW_COUNT;
+    RETURN changed_count;
+END;
+$$;
+
+COMMENT ON FUNCTION save_menu_translations_bulk(UUID, TEXT, JSONB) IS 'Bulk upsert of menu_translations, skipping rows with unchanged source_hash; returns number of rows written';
@@ -0,0 +1,9 @@
+-- Indexes for listing a restaurant's service requests, newest first
+-- Used by GET /api/service-requests (optionally filtered by status) and the POS
+-- orders page (status IN ('pending', 'acknowledged'))
+
+CREATE INDEX IF NOT EXISTS idx_service_requests_restaurant_created
+    ON service_requests(restaurant_id, created_at DESC);
+
+CREATE INDEX IF NOT EXISTS idx_service_requests_restaurant_status_created
+    ON service_requests(restaurant_id, status, created_at DESC);
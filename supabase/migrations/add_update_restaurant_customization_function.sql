@@ -0,0 +1,41 @@
+-- Resolve the owner's restaurant and update its branding fields in one call
+-- Used by the customization endpoints (theme color, logo, cover image) instead of
+-- get_restaurant_by_id → get_restaurant_by_user_id → update
+-- (backend falls back to those separate queries if missing)
+-- p_restaurant_id is TEXT: non-UUID or unknown ids fall through to the user's first restaurant
+-- Only keys present in p_updates are changed: theme_color, logo_url, cover_image_url
+-- Returns the updated row, or no row when the user owns no matching restaurant
+
+CREATE OR REPLACE FUNCTION update_restaurant_customization(
+    p_restaurant_id TEXT,
+    p_user_id UUID,
+    p_updates JSONB
+)
+RETURNS SETOF restaurants
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    v_restaurant_id UUID;
+BEGIN
+    -- Compare on the uuid column (PK index); the cast only runs for UUID-shaped input
+    IF p_restaurant_id ~* '^[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}$' THEN
+        SELECT id INTO v_restaurant_id FROM restaurants WHERE id = p_restaurant_id::uuid;
+    END IF;
+
+    IF v_restaurant_id IS NULL THEN
+        SELECT id INTO v_restaurant_id FROM restaurants WHERE user_id = p_user_id LIMIT 1;
+    END IF;
+
+    RETURN QUERY
+    UPDATE restaurants r
+    SET
+        theme_color = CASE WHEN p_updates ? 'theme_color' THEN p_updates->>'theme_color' ELSE r.theme_color END,
+        logo_url = CASE WHEN p_updates ? 'logo_url' THEN p_updates->>'logo_url' ELSE r.logo_url END,
+        cover_image_url = CASE WHEN p_updates ? 'cover_image_url' THEN p_updates->>'cover_image_url' ELSE r.cover_image_url END
+    WHERE r.id = v_restaurant_id
+      AND r.user_id = p_user_id
+    RETURNING r.*;
+END;
+$$;
+
+COMMENT ON FUNCTION update_restaurant_customization(TEXT, UUID, JSONB) IS 'Find restaurant by id (or the user''s first restaurant) and update theme_color/logo_url/cover_image_url in one round trip';
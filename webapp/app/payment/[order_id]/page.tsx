@@ -455,29 +455,23 @@ export default function PaymentPage() {
     if (!order) return;
 
     try {
-      // Convert to base64
-      const reader = new FileReader();
-      reader.onloadend = async () => {
-        const base64 = (reader.result as string).split(',')[1];
+      // Send the file as multipart (no base64 conversion)
+      const formData = new FormData();
+      formData.append('order_id', order.id);
+      formData.append('file', file);
 
-        const response = await fetch(`${API_URL}/api/payments/upload-slip`, {
-          method: 'POST',
-          headers: { 'Content-Type': 'application/json' },
-          body: JSON.stringify({
-            order_id: order.id,
-            slip_image_base64: base64,
-          }),
-        });
+      const response = await fetch(`${API_URL}/api/payments/upload-slip-file`, {
+        method: 'POST',
+        body: formData,
+      });
 
-        const data = await response.json();
-        if (data.success) {
-          // Redirect to order status page
-          router.push(`/order-status?order=${order.id}&type=${order.service_type}`);
-        } else {
-          setError(data.detail || 'Failed to upload slip');
-        }
-      };
-      reader.readAsDataURL(file);
+      const data = await response.json();
+      if (data.success) {
+        // Redirect to order status page
+        router.push(`/order-status?order=${order.id}&type=${order.service_type}`);
+      } else {
+        setError(data.detail || 'Failed to upload slip');
+      }
     } catch (err) {
       console.error('Error uploading slip:', err);
       setError('Failed to upload slip');
@@ -23,6 +23,7 @@ interface MenuItem {
   is_best_seller?: boolean;
   meats?: Array<{name: string; nameEn?: string; price: string}>;
   addOns?: Array<{name: string; nameEn?: string; price: string}>;
+  source_hash?: string; // blake2b of translatable text, computed by the backend
 }
 
 interface CartItem {
@@ -408,6 +409,9 @@ export default function RestaurantMenuPage() {
 
   // Helper function to generate a simple hash for cache invalidation detection
   const generateSourceHash = (menu: MenuItem): string => {
+    // Prefer the server-computed hash (blake2b), same scheme used when saving the cache
+    if (menu.source_hash) return menu.source_hash;
+
     const sourceText = [
       menu.name || '',
       menu.description || '',